@@ -0,0 +1,184 @@
+"""
+Benchmark suite for ``geohash``.
+
+``geohash`` switches silently between the ``_geohash`` C extension and
+several pure Python code paths. This script forces each backend in turn
+and times the single point functions at several precisions:
+
+* ``c``: the ``_geohash`` extension (skipped when it is not installed);
+* ``python``: the default pure Python engine (``_quantize_scaled``);
+* ``fromhex``: the ``float.hex()`` string engine (``_quantize_fromhex``);
+* ``legacy``: the arithmetic used by interpreters without ``float.fromhex``.
+
+Results are printed as a table, or with ``--json`` as one JSON object per
+line, so runs can be stored and compared to track regressions::
+
+    python bench_geohash.py --json > results.jsonl
+    python bench_geohash.py --backends python,fromhex --ops encode,decode
+
+``--parallel`` adds the throughput of the batch functions per process count.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import sys
+import time
+import timeit
+from array import array
+
+import geohash
+
+
+BACKENDS = {
+    'c': dict(_geohash=geohash._geohash),
+    'python': dict(_geohash=None, _quantize=geohash._quantize_scaled,
+                   _has_fromhex=True),
+    'fromhex': dict(_geohash=None, _quantize=geohash._quantize_fromhex,
+                    _has_fromhex=True),
+    'legacy': dict(_geohash=None, _quantize=None, _has_fromhex=False),
+}
+
+PRECISIONS = (5, 9, 12)
+UINT64_PRECISIONS = (20, 40, 60)
+
+
+@contextlib.contextmanager
+def backend(name):
+    """Patch the ``geohash`` module globals that select a code path."""
+    settings = dict(BACKENDS[name], _caches={})
+    saved = {attr: getattr(geohash, attr) for attr in settings}
+    for attr, value in settings.items():
+        setattr(geohash, attr, value)
+    try:
+        yield
+    finally:
+        for attr, value in saved.items():
+            setattr(geohash, attr, value)
+
+
+def available_backends():
+    return [name for name in BACKENDS
+            if name != 'c' or geohash._geohash is not None]
+
+
+def make_cases(points):
+    """Return ``(op, precision, callable)`` triples, one call per point."""
+    cases = []
+    for precision in PRECISIONS:
+        hashcodes = [geohash.encode(lat, lon, precision) for lat, lon in points]
+        cases += [
+            ('encode', precision,
+             lambda p=precision: [geohash.encode(lat, lon, p) for lat, lon in points]),
+            ('decode', precision,
+             lambda h=hashcodes: [geohash.decode(code) for code in h]),
+            ('bbox', precision,
+             lambda h=hashcodes: [geohash.bbox(code) for code in h]),
+            ('neighbors', precision,
+             lambda h=hashcodes: [geohash.neighbors(code) for code in h]),
+            ('expand', precision,
+             lambda h=hashcodes: [geohash.expand(code) for code in h]),
+        ]
+    cases.append(('encode_uint64', 64,
+                  lambda: [geohash.encode_uint64(lat, lon) for lat, lon in points]))
+    keys = [geohash.encode_uint64(lat, lon) for lat, lon in points]
+    for precision in UINT64_PRECISIONS:
+        cases.append(('expand_uint64', precision,
+                      lambda p=precision: [geohash.expand_uint64(k, p) for k in keys]))
+    return cases
+
+
+def run_suite(backends, ops, n_points, repeat):
+    random.seed(0)
+    points = [(random.uniform(-90, 90), random.uniform(-180, 180))
+              for _ in range(n_points)]
+    with backend('python'):
+        cases = [case for case in make_cases(points) if case[0] in ops]
+    for name in backends:
+        with backend(name):
+            for op, precision, func in cases:
+                best = min(timeit.repeat(func, number=1, repeat=repeat))
+                yield dict(op=op, backend=name, precision=precision,
+                           ns_per_call=round(best / n_points * 1e9, 1))
+
+
+def run_parallel(n_points, repeat):
+    random.seed(0)
+    lats = array('d', (random.uniform(-90, 90) for _ in range(n_points)))
+    lons = array('d', (random.uniform(-180, 180) for _ in range(n_points)))
+    keys = geohash.encode_uint64_many(lats, lons)
+    hashcodes = geohash.encode_many(lats, lons, 12)
+    funcs = [
+        ('encode_many', geohash.encode_many, (lats, lons, 12)),
+        ('decode_many', geohash.decode_many, (hashcodes,)),
+        ('encode_uint64_many', geohash.encode_uint64_many, (lats, lons)),
+        ('decode_uint64_many', geohash.decode_uint64_many, (keys,)),
+    ]
+    counts = sorted({1, 2, 4, os.cpu_count() or 1})
+    for op, func, args in funcs:
+        serial = None
+        for processes in counts:
+            best = float('inf')
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                func(*args, parallel=processes)
+                best = min(best, time.perf_counter() - t0)
+            serial = serial or best
+            yield dict(op=op, backend='numpy' if geohash.numpy else 'python',
+                       processes=processes,
+                       mpoints_per_s=round(n_points / best / 1e6, 2),
+                       speedup=round(serial / best, 2))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--backends', default=','.join(available_backends()),
+                        help='comma separated backends (default: all available)')
+    parser.add_argument('--ops', default='encode,decode,bbox,neighbors,expand,'
+                        'encode_uint64,expand_uint64',
+                        help='comma separated operations (default: all)')
+    parser.add_argument('--points', type=int, default=10_000,
+                        help='calls per measurement (default: 10000)')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='best of this many runs (default: 5)')
+    parser.add_argument('--parallel', type=int, default=0, metavar='POINTS',
+                        help='also time the batch functions on POINTS points')
+    parser.add_argument('--json', action='store_true',
+                        help='print one JSON object per result')
+    args = parser.parse_args(argv)
+
+    backends = args.backends.split(',')
+    for name in backends:
+        if name not in BACKENDS:
+            parser.error(f'unknown backend {name!r}')
+        if name not in available_backends():
+            parser.error(f'backend {name!r} is not available')
+
+    env = dict(python=platform.python_version(), geohash=geohash.__version__,
+               numpy=geohash.numpy.__version__ if geohash.numpy else None)
+    results = list(run_suite(backends, set(args.ops.split(',')),
+                             args.points, args.repeat))
+    if args.parallel:
+        results += run_parallel(args.parallel, args.repeat)
+
+    if args.json:
+        for result in results:
+            print(json.dumps(dict(result, **env)))
+        return
+
+    print(' '.join(f'{k}={v}' for k, v in env.items()))
+    for result in results:
+        if 'processes' in result:
+            print(f'{result["op"]:>18} {result["processes"]:3} processes '
+                  f'{result["mpoints_per_s"]:8.2f} Mpoints/s '
+                  f'{result["speedup"]:5.2f}x')
+        else:
+            print(f'{result["op"]:>18} {result["backend"]:>8} '
+                  f'{result["precision"]:3} {result["ns_per_call"]:10.1f} ns')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,158 @@
+"""
+Micro-benchmarks for ``bitops`` and ``UintSet``.
+
+Run with ``python bench_uintset.py`` from this directory.
+"""
+
+import os
+import random
+import threading
+import time
+import timeit
+
+from array import array
+
+import bitops
+import parallel
+from concurrent_uintset import ConcurrentUintSet
+from uintset import UintSet
+
+
+def best_of(func, repeat=5, number=1):
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+def sample_bigints():
+    random.seed(0)
+    size = 10 ** 8
+    sparse = sum(1 << random.randrange(size) for _ in range(1000))
+    dense = random.getrandbits(size)
+    return [('sparse', sparse), ('dense', dense)]
+
+
+def bench_count_ones():
+    print('count_ones on 10**8 bit integers')
+    engines = [
+        ('int.bit_count', bitops.count_ones),
+        ('byte table', bitops.count_ones_table),
+    ]
+    for label, bigint in sample_bigints():
+        for name, func in engines:
+            seconds = best_of(lambda: func(bigint))
+            print(f'{label:>8} {name:>14} {seconds * 1e3:10.3f} ms')
+
+
+def bench_find_ones():
+    print('iterating with find_ones')
+    random.seed(0)
+    cases = [
+        ('{10**7}', 1 << 10 ** 7),
+        ('1000 in 10**8', sum(1 << random.randrange(10 ** 8) for _ in range(1000))),
+        ('dense 10**6', random.getrandbits(10 ** 6)),
+    ]
+    for label, bigint in cases:
+        seconds = best_of(lambda: sum(1 for _ in bitops.find_ones(bigint)), repeat=3)
+        print(f'{label:>14} {seconds * 1e3:10.3f} ms')
+
+
+def bench_build():
+    print('building a UintSet of 10**4 elements below 10**7')
+    random.seed(0)
+    elements = array('Q', (random.randrange(10 ** 7) for _ in range(10 ** 4)))
+
+    def add_each():
+        s = UintSet()
+        for e in elements:
+            s.add(e)
+
+    cases = [
+        ('add each', add_each),
+        ('from_iterable', lambda: UintSet.from_iterable(elements)),
+        ('from_array', lambda: UintSet.from_array(elements)),
+    ]
+    for name, func in cases:
+        seconds = best_of(func, repeat=3)
+        print(f'{name:>14} {seconds * 1e3:10.3f} ms')
+
+
+def run_threads(add, elements, threads):
+    shards = [elements[i::threads] for i in range(threads)]
+
+    def work(shard):
+        for e in shard:
+            add(e)
+
+    workers = [threading.Thread(target=work, args=(shard,)) for shard in shards]
+    t0 = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return time.perf_counter() - t0
+
+
+def bench_contention():
+    print('adding 2 * 10**4 elements below 10**6 from several threads')
+    random.seed(0)
+    elements = [random.randrange(10 ** 6) for _ in range(2 * 10 ** 4)]
+
+    def locked_uintset():
+        s, lock = UintSet(), threading.Lock()
+
+        def add(e):
+            with lock:
+                s.add(e)
+        return add
+
+    cases = [
+        ('UintSet + Lock', locked_uintset),
+        ('Concurrent', lambda: ConcurrentUintSet().add),
+    ]
+    for threads in (1, 2, 4, 8, 16):
+        for name, make_add in cases:
+            seconds = min(run_threads(make_add(), elements, threads) for _ in range(3))
+            print(f'{threads:3} threads {name:>14} {len(elements) / seconds / 1e3:10.1f} kops/s')
+
+
+def bench_parallel():
+    print('set operations on two 4 * 10**8 bit sets: int vs SharedUintSet per process count')
+    random.seed(0)
+    first, second = UintSet(), UintSet()
+    first._bigint = random.getrandbits(4 * 10 ** 8)
+    second._bigint = random.getrandbits(4 * 10 ** 8)
+    a, b = first._bigint, second._bigint
+    shared_first = parallel.SharedUintSet.from_uintset(first)
+    shared_second = parallel.SharedUintSet.from_uintset(second)
+
+    def run(op, processes):
+        parallel.combine(op, shared_first, shared_second, processes).close()
+
+    cases = [
+        ('union', lambda: a | b, lambda p: run('union', p)),
+        ('intersection', lambda: a & b, lambda p: run('intersection', p)),
+        ('difference', lambda: a & ~b, lambda p: run('difference', p)),
+        ('symmetric_diff', lambda: a ^ b, lambda p: run('symmetric_difference', p)),
+        ('count', lambda: bitops.count_ones(a), lambda p: parallel.count(shared_first, p)),
+    ]
+    try:
+        for name, serial, func in cases:
+            seconds = best_of(serial, repeat=3)
+            print(f'{name:>14}       int {seconds * 1e3:10.3f} ms')
+            for processes in sorted({1, 2, 4, os.cpu_count() or 1}):
+                seconds = best_of(lambda: func(processes), repeat=3)
+                print(f'{name:>14} {processes:3} procs {seconds * 1e3:10.3f} ms')
+    finally:
+        shared_first.close()
+        shared_second.close()
+
+
+def main():
+    bench_count_ones()
+    bench_find_ones()
+    bench_build()
+    bench_contention()
+    bench_parallel()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,27 @@
+import re
 import sys
 
 
-def count_ones(bigint):
+NONZERO_RUN = re.compile(rb'[^\x00]+')
+ONES_PER_BYTE = bytes(bin(i).count('1') for i in range(256))
+CHUNK_SIZE = 2 ** 16  # bytes per step in count_ones_table
+
+
+def count_ones_table(bigint):
+    data = bigint.to_bytes((bigint.bit_length() + 7) // 8, 'little')
     count = 0
-    while bigint:
-        count += bigint & 1
-        bigint >>= 1
+    for start in range(0, len(data), CHUNK_SIZE):
+        count += sum(data[start:start + CHUNK_SIZE].translate(ONES_PER_BYTE))
     return count
 
 
+if hasattr(int, 'bit_count'):  # Python >= 3.10
+    def count_ones(bigint):
+        return bigint.bit_count()
+else:
+    count_ones = count_ones_table
+
+
 def get_bit(bigint, index):
     return bool(bigint & (1 << index))
 
@@ -23,12 +36,33 @@ def unset_bit(bigint, index):
     return bigint
 
 
+def find_ones_in_bytes(data):
+    """Yield the indexes of the 1 bits of a little-endian bytes-like object."""
+    # the regex skips runs of zero bytes in C; set bits are then
+    # isolated word by word, so the cost follows the number of ones
+    for run in NONZERO_RUN.finditer(data):
+        start, end = run.span()
+        for pos in range(start, end, 8):
+            word = int.from_bytes(data[pos:min(pos + 8, end)], 'little')
+            base = pos * 8
+            while word:
+                low = word & -word
+                yield base + low.bit_length() - 1
+                word ^= low
+
+
 def find_ones(bigint):
-    index = 0
-    while True:
-        if bigint & 1:
-            yield index
-        bigint >>= 1
-        if bigint == 0:
-            break
-        index += 1
+    data = bigint.to_bytes((bigint.bit_length() + 7) // 8, 'little')
+    return find_ones_in_bytes(data)
+
+
+def is_subset(a, b):
+    """Return True if every 1 bit of a is also set in b."""
+    # a longer int can not be a subset; otherwise one pass, which beats
+    # copying both ints to bytes to stop early
+    return a.bit_length() <= b.bit_length() and not a & ~b
+
+
+def is_disjoint(a, b):
+    """Return True if a and b have no 1 bit in common."""
+    return not a & b
@@ -0,0 +1,103 @@
+"""
+A ``UintSet`` variant that many threads can update at once.
+
+``UintSet.add`` rebinds ``self._bigint`` to a new ``int``, so two threads
+adding at the same time can both start from the old value and one of the
+updates is lost. ``ConcurrentUintSet`` shards the elements into chunks of
+2**16 values, like ``RoaringUintSet``, each stored as a small ``int``
+bitmap. A chunk is only rewritten while holding one of a fixed number of
+striped locks, so writers to different chunks rarely wait for each other.
+
+Reads of a single element need no lock. ``snapshot()`` takes every lock,
+in order, and returns a consistent ``UintSet`` copy.
+"""
+
+import threading
+
+import bitops
+from roaring import CHUNK_BITS, LOW_MASK, check_element, chunk_bits, join_chunks
+from uintset import INVALID_ITER_ARG_MSG, UintSet
+
+
+LOCK_STRIPES = 64
+
+
+class ConcurrentUintSet:
+
+    def __init__(self, elements=None, stripes=LOCK_STRIPES):
+        self._chunks = {}
+        self._locks = [threading.Lock() for _ in range(stripes)]
+        if elements:
+            self.update(elements)
+
+    def _lock(self, high):
+        return self._locks[high % len(self._locks)]
+
+    def add(self, elem):
+        check_element(elem)
+        high = elem >> CHUNK_BITS
+        bit = 1 << (elem & LOW_MASK)
+        with self._lock(high):
+            self._chunks[high] = self._chunks.get(high, 0) | bit
+
+    def discard(self, elem):
+        check_element(elem)
+        high = elem >> CHUNK_BITS
+        with self._lock(high):
+            bits = self._chunks.get(high, 0) & ~(1 << (elem & LOW_MASK))
+            if bits:
+                self._chunks[high] = bits
+            else:
+                self._chunks.pop(high, None)
+
+    def update(self, elements):
+        """Add many elements, taking each chunk lock once."""
+        try:
+            elements = iter(elements)
+        except TypeError:
+            raise TypeError(INVALID_ITER_ARG_MSG)
+        lows = {}
+        for e in elements:
+            check_element(e)
+            lows.setdefault(e >> CHUNK_BITS, []).append(e & LOW_MASK)
+        for high, values in lows.items():
+            bits = chunk_bits(values)
+            with self._lock(high):
+                self._chunks[high] = self._chunks.get(high, 0) | bits
+
+    def __contains__(self, elem):
+        check_element(elem)
+        bits = self._chunks.get(elem >> CHUNK_BITS, 0)
+        return bitops.get_bit(bits, elem & LOW_MASK)
+
+    def snapshot(self):
+        """Return a ``UintSet`` with the elements at one point in time."""
+        for lock in self._locks:
+            lock.acquire()
+        try:
+            chunks = self._chunks.copy()
+        finally:
+            for lock in reversed(self._locks):
+                lock.release()
+        res = UintSet()
+        res._bigint = join_chunks(chunks)
+        return res
+
+    def __len__(self):
+        return sum(bitops.count_ones(bits) for bits in self._chunks.copy().values())
+
+    def __iter__(self):
+        return iter(self.snapshot())
+
+    def __repr__(self):
+        elements = ', '.join(str(e) for e in self)
+        if elements:
+            elements = '{' + elements + '}'
+        return f'ConcurrentUintSet({elements})'
+
+    def __eq__(self, other):
+        if isinstance(other, ConcurrentUintSet):
+            other = other.snapshot()
+        if isinstance(other, UintSet):
+            return self.snapshot() == other
+        return NotImplemented
@@ -1,5 +1,6 @@
 import sys
 
+import natural
 import uintset
 
 class EmptySet:
@@ -20,6 +21,9 @@ class EmptySet:
 
     __rand__ = __and__
 
+    def __invert__(self):
+        return natural.N
+
     def __repr__(self):
         return 'EmptySet()'
 
@@ -1,5 +1,7 @@
 import sys
 
+import empty
+
 class NaturalSet:
 
     def __len__(self):
@@ -18,6 +20,9 @@ class NaturalSet:
 
     __rand__ = __and__
 
+    def __invert__(self):
+        return empty.Empty
+
     def __repr__(self):
         return 'NaturalSet()'
 
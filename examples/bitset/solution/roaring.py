@@ -0,0 +1,317 @@
+"""
+A compressed alternative to ``UintSet`` for large, sparse sets.
+
+Elements are split into chunks of 2**16 values by their high bits. Each
+chunk stores its low 16 bits in whichever container is smallest:
+
+* ``ArrayContainer``: a sorted ``array('H')``, for sparse chunks;
+* ``BitmapContainer``: a 2**16 bit ``int``, for dense chunks;
+* ``RunContainer``: ``(first, last)`` runs, for ranges.
+
+One element of value 2**30 takes a single 2 byte array entry instead of
+the 128 MiB that ``UintSet`` needs for its ``int``.
+"""
+
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+
+import bitops
+from uintset import INVALID_ELEMENT_MSG, INVALID_ITER_ARG_MSG, UintSet
+
+
+CHUNK_BITS = 16
+CHUNK_SIZE = 1 << CHUNK_BITS
+LOW_MASK = CHUNK_SIZE - 1
+BITMAP_BYTES = CHUNK_SIZE // 8
+ARRAY_MAX = BITMAP_BYTES // 2  # larger arrays take more room than a bitmap
+
+
+def check_element(elem):
+    if not isinstance(elem, int):
+        raise TypeError(INVALID_ELEMENT_MSG)
+    if elem < 0:
+        raise ValueError(INVALID_ELEMENT_MSG)
+
+
+def chunk_bits(lows):
+    """Return the chunk bitmap with the bits of the low 16 bit values set."""
+    buf = bytearray(BITMAP_BYTES)
+    for low in lows:
+        buf[low >> 3] |= 1 << (low & 7)
+    return int.from_bytes(buf, 'little')
+
+
+def join_chunks(chunks):
+    """Return the ``UintSet`` bitmap of a ``{high: chunk bitmap}`` dict."""
+    if not chunks:
+        return 0
+    buf = bytearray((max(chunks) + 1) * BITMAP_BYTES)
+    for high, bits in chunks.items():
+        pos = high * BITMAP_BYTES
+        buf[pos:pos + BITMAP_BYTES] = bits.to_bytes(BITMAP_BYTES, 'little')
+    return int.from_bytes(buf, 'little')
+
+
+def best_container(bits):
+    """Return the smallest container holding the chunk bitmap ``bits``."""
+    count = bitops.count_ones(bits)
+    starts = bits & ~(bits << 1)
+    run_count = bitops.count_ones(starts)
+    if 4 * run_count < min(2 * count, BITMAP_BYTES):
+        ends = bits & ~(bits >> 1)
+        return RunContainer(zip(bitops.find_ones(starts), bitops.find_ones(ends)))
+    if count <= ARRAY_MAX:
+        return ArrayContainer(array('H', bitops.find_ones(bits)))
+    return BitmapContainer(bits, count)
+
+
+class ArrayContainer:
+
+    def __init__(self, values):
+        self.values = values
+
+    def __len__(self):
+        return len(self.values)
+
+    def __contains__(self, low):
+        values = self.values
+        i = bisect_left(values, low)
+        return i < len(values) and values[i] == low
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def add(self, low):
+        values = self.values
+        i = bisect_left(values, low)
+        if i < len(values) and values[i] == low:
+            return self
+        if len(values) >= ARRAY_MAX:
+            return BitmapContainer(self.to_int() | (1 << low))
+        values.insert(i, low)
+        return self
+
+    def to_int(self):
+        return chunk_bits(self.values)
+
+    def nbytes(self):
+        return len(self.values) * self.values.itemsize
+
+
+class BitmapContainer:
+
+    def __init__(self, bits, count=None):
+        self.bits = bits
+        self.count = bitops.count_ones(bits) if count is None else count
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, low):
+        return bitops.get_bit(self.bits, low)
+
+    def __iter__(self):
+        return bitops.find_ones(self.bits)
+
+    def add(self, low):
+        if not bitops.get_bit(self.bits, low):
+            self.bits = bitops.set_bit(self.bits, low)
+            self.count += 1
+        return self
+
+    def to_int(self):
+        return self.bits
+
+    def nbytes(self):
+        return BITMAP_BYTES
+
+
+class RunContainer:
+
+    def __init__(self, runs):
+        self.firsts = array('H')
+        self.lasts = array('H')
+        for first, last in runs:
+            self.firsts.append(first)
+            self.lasts.append(last)
+
+    def __len__(self):
+        return sum(self.lasts) - sum(self.firsts) + len(self.firsts)
+
+    def __contains__(self, low):
+        i = bisect_right(self.firsts, low) - 1
+        return i >= 0 and low <= self.lasts[i]
+
+    def __iter__(self):
+        for first, last in zip(self.firsts, self.lasts):
+            yield from range(first, last + 1)
+
+    def add(self, low):
+        if low in self:
+            return self
+        return best_container(self.to_int() | (1 << low))
+
+    def to_int(self):
+        bits = 0
+        for first, last in zip(self.firsts, self.lasts):
+            bits |= ((1 << (last - first + 1)) - 1) << first
+        return bits
+
+    def nbytes(self):
+        return 2 * len(self.firsts) * self.firsts.itemsize
+
+
+class RoaringUintSet:
+
+    def __init__(self, elements=None):
+        self._chunks = {}
+        if elements:
+            self._chunks = self._build(elements)
+
+    @staticmethod
+    def _build(elements):
+        lows = {}
+        for e in elements:
+            check_element(e)
+            lows.setdefault(e >> CHUNK_BITS, []).append(e & LOW_MASK)
+        chunks = {}
+        for high, values in lows.items():
+            chunks[high] = best_container(chunk_bits(values))
+        return chunks
+
+    @classmethod
+    def from_iterable(cls, elements):
+        res = cls()
+        res._chunks = cls._build(elements)
+        return res
+
+    @classmethod
+    def from_range(cls, start, stop):
+        check_element(start)
+        check_element(stop)
+        res = cls()
+        for high in range(start >> CHUNK_BITS, ((stop - 1) >> CHUNK_BITS) + 1):
+            base = high << CHUNK_BITS
+            first = max(start, base) - base
+            last = min(stop - 1, base + LOW_MASK) - base
+            if first <= last:
+                res._chunks[high] = RunContainer([(first, last)])
+        return res
+
+    @classmethod
+    def from_uintset(cls, uintset):
+        res = cls()
+        data = uintset._bigint.to_bytes(
+            (uintset._bigint.bit_length() + 7) // 8, 'little')
+        for pos in range(0, len(data), BITMAP_BYTES):
+            bits = int.from_bytes(data[pos:pos + BITMAP_BYTES], 'little')
+            if bits:
+                res._chunks[pos // BITMAP_BYTES] = best_container(bits)
+        return res
+
+    def to_uintset(self):
+        res = UintSet()
+        res._bigint = join_chunks({high: container.to_int()
+                                   for high, container in self._chunks.items()})
+        return res
+
+    def optimize(self):
+        """Re-pick the smallest container of every chunk, e.g. after many adds."""
+        for high, container in self._chunks.items():
+            self._chunks[high] = best_container(container.to_int())
+
+    def memory_usage(self):
+        """Approximate bytes used by the containers and the chunk table."""
+        containers = sum(c.nbytes() + sys.getsizeof(c) for c in self._chunks.values())
+        return sys.getsizeof(self._chunks) + containers
+
+    def __len__(self):
+        return sum(len(c) for c in self._chunks.values())
+
+    def add(self, elem):
+        check_element(elem)
+        high, low = elem >> CHUNK_BITS, elem & LOW_MASK
+        container = self._chunks.get(high)
+        if container is None:
+            self._chunks[high] = ArrayContainer(array('H', [low]))
+        else:
+            self._chunks[high] = container.add(low)
+
+    def __contains__(self, elem):
+        check_element(elem)
+        container = self._chunks.get(elem >> CHUNK_BITS)
+        return container is not None and (elem & LOW_MASK) in container
+
+    def __iter__(self):
+        for high in sorted(self._chunks):
+            base = high << CHUNK_BITS
+            for low in self._chunks[high]:
+                yield base + low
+
+    def __repr__(self):
+        elements = ', '.join(str(e) for e in self)
+        if elements:
+            elements = '{' + elements + '}'
+        return f'RoaringUintSet({elements})'
+
+    def __eq__(self, other):
+        if isinstance(other, UintSet):
+            # the highest chunk must match before building any containers
+            top = other._bigint.bit_length() - 1
+            if top < 0 or not self._chunks:
+                return top < 0 and not self._chunks
+            if top >> CHUNK_BITS != max(self._chunks):
+                return False
+            other = RoaringUintSet.from_uintset(other)
+        if not isinstance(other, RoaringUintSet):
+            return NotImplemented
+        if self._chunks.keys() != other._chunks.keys():
+            return False
+        return all(c.to_int() == other._chunks[high].to_int()
+                   for high, c in self._chunks.items())
+
+    def _combine(self, other, keep_unmatched, op):
+        chunks = {}
+        for high in self._chunks.keys() | other._chunks.keys():
+            mine, theirs = self._chunks.get(high), other._chunks.get(high)
+            if mine is None or theirs is None:
+                if keep_unmatched:
+                    chunks[high] = best_container((mine or theirs).to_int())
+                continue
+            bits = op(mine.to_int(), theirs.to_int())
+            if bits:
+                chunks[high] = best_container(bits)
+        res = self.__class__()
+        res._chunks = chunks
+        return res
+
+    def __or__(self, other):
+        if isinstance(other, RoaringUintSet):
+            return self._combine(other, True, int.__or__)
+        return NotImplemented
+
+    def __and__(self, other):
+        if isinstance(other, RoaringUintSet):
+            return self._combine(other, False, int.__and__)
+        return NotImplemented
+
+    def _coerce(self, other):
+        if isinstance(other, RoaringUintSet):
+            return other
+        try:
+            return self.__class__(other)
+        except TypeError:
+            raise TypeError(INVALID_ITER_ARG_MSG)
+
+    def union(self, *others):
+        res = self | self.__class__()
+        for other in others:
+            res = res | self._coerce(other)
+        return res
+
+    def intersection(self, *others):
+        res = self | self.__class__()
+        for other in others:
+            res = res & self._coerce(other)
+        return res
@@ -0,0 +1,230 @@
+"""
+Lazy set expressions over ``UintSet``, ``N`` and ``Empty``.
+
+``~s`` on a ``UintSet`` and ``lazy(s)`` on any set start an expression;
+``|``, ``&``, ``-`` and ``~`` on it build a tree instead of a new set::
+
+    >>> from uintset import UintSet
+    >>> a, b, c = UintSet([1, 2]), UintSet([2, 3, 4]), UintSet([3])
+    >>> expr = a | b & ~c
+    >>> expr
+    Union(UintSet({1, 2}), Intersection(UintSet({2, 3, 4}), Complement(UintSet({3}))))
+    >>> expr.evaluate()
+    UintSet({1, 2, 4})
+
+``evaluate()`` first simplifies the tree with the identities of ``N`` and
+``Empty`` (``x | N == N``, ``x & Empty == Empty``, ``x & ~x == Empty``...)
+and then computes it in one pass over the ``int`` bitmaps: n-ary unions and
+intersections combine their operands smallest first, an intersection stops
+as soon as it is empty, and ``a & ~c`` is computed as ``a - c`` without
+building the complement. A result that is not finite, like ``~a``, raises
+``ValueError``.
+"""
+
+from empty import Empty
+from natural import N
+from uintset import UintSet
+
+
+UNBOUNDED_MSG = 'expression has infinitely many elements'
+
+
+def lazy(s):
+    """Wrap a ``UintSet``, ``N`` or ``Empty`` to build an expression."""
+    if isinstance(s, Expr):
+        return s
+    if s is N or s is Empty or isinstance(s, UintSet):
+        return Leaf(s)
+    raise TypeError('expected UintSet, N or Empty')
+
+
+class Expr:
+
+    def __or__(self, other):
+        return Union([self, lazy(other)])
+
+    def __ror__(self, other):
+        return Union([lazy(other), self])
+
+    def __and__(self, other):
+        return Intersection([self, lazy(other)])
+
+    def __rand__(self, other):
+        return Intersection([lazy(other), self])
+
+    def __sub__(self, other):
+        return Intersection([self, Complement(lazy(other))])
+
+    def __rsub__(self, other):
+        return Intersection([lazy(other), Complement(self)])
+
+    def __invert__(self):
+        return Complement(self)
+
+    def evaluate(self):
+        """Simplify, compute the bitmap once and return a ``UintSet``."""
+        bits, negated = self.simplify()._bits()
+        if negated:
+            raise ValueError(UNBOUNDED_MSG)
+        res = UintSet()
+        res._bigint = bits
+        return res
+
+    # _bits() returns (bits, negated): the set is ~bits when negated is true
+
+
+class Leaf(Expr):
+
+    def __init__(self, value):
+        self.value = value
+
+    def simplify(self):
+        return self
+
+    def _bits(self):
+        if self.value is N:
+            return 0, True
+        if self.value is Empty:
+            return 0, False
+        return self.value._bigint, False
+
+    def __contains__(self, element):
+        return element in self.value
+
+    def __eq__(self, other):
+        return isinstance(other, Leaf) and self.value is other.value
+
+    def __hash__(self):
+        return id(self.value)
+
+    def __repr__(self):
+        return repr(self.value)
+
+
+EMPTY, NATURAL = Leaf(Empty), Leaf(N)
+
+
+class Complement(Expr):
+
+    def __init__(self, term):
+        self.term = term
+
+    def simplify(self):
+        term = self.term.simplify()
+        if isinstance(term, Complement):
+            return term.term
+        if term == NATURAL:
+            return EMPTY
+        if term == EMPTY:
+            return NATURAL
+        return Complement(term)
+
+    def _bits(self):
+        bits, negated = self.term._bits()
+        return bits, not negated
+
+    def __contains__(self, element):
+        return element >= 0 and element not in self.term
+
+    def __eq__(self, other):
+        return isinstance(other, Complement) and self.term == other.term
+
+    def __hash__(self):
+        return ~hash(self.term)
+
+    def __repr__(self):
+        return f'Complement({self.term!r})'
+
+
+class _NaryExpr(Expr):
+    # subclasses set identity (x op identity == x) and absorbing
+    # (x op absorbing == absorbing)
+
+    def __init__(self, terms):
+        self.terms = terms
+
+    def simplify(self):
+        terms = []
+        for term in self.terms:
+            term = term.simplify()
+            if isinstance(term, self.__class__):  # flatten (a | b) | c
+                terms.extend(term.terms)
+            else:
+                terms.append(term)
+        unique = []
+        for term in terms:
+            if term == self.absorbing:
+                return self.absorbing
+            if term != self.identity and term not in unique:
+                unique.append(term)
+        # x | ~x == N and x & ~x == Empty
+        for term in unique:
+            if isinstance(term, Complement) and term.term in unique:
+                return self.absorbing
+        if not unique:
+            return self.identity
+        if len(unique) == 1:
+            return unique[0]
+        return self.__class__(unique)
+
+    def _split(self):
+        plain, complemented = [], []
+        for term in self.terms:
+            bits, negated = term._bits()
+            (complemented if negated else plain).append(bits)
+        return plain, complemented
+
+    def __eq__(self, other):
+        return isinstance(other, self.__class__) and self.terms == other.terms
+
+    def __hash__(self):
+        return hash(tuple(self.terms))
+
+    def __repr__(self):
+        terms = ', '.join(repr(t) for t in self.terms)
+        return f'{self.__class__.__name__}({terms})'
+
+
+class Union(_NaryExpr):
+
+    identity, absorbing = EMPTY, NATURAL
+
+    def _bits(self):
+        plain, complemented = self._split()
+        res = 0
+        for bits in sorted(plain, key=int.bit_length):
+            res |= bits
+        if not complemented:
+            return res, False
+        # a | ~c | ~d == ~((c & d) - a)
+        inverse = complemented[0]
+        for bits in complemented[1:]:
+            inverse &= bits
+        return inverse & ~res, True
+
+    def __contains__(self, element):
+        return any(element in term for term in self.terms)
+
+
+class Intersection(_NaryExpr):
+
+    identity, absorbing = NATURAL, EMPTY
+
+    def _bits(self):
+        plain, complemented = self._split()
+        excluded = 0
+        for bits in sorted(complemented, key=int.bit_length):
+            excluded |= bits
+        if not plain:
+            return excluded, True
+        # a & b & ~c == (a & b) - c, smallest operand first
+        plain.sort(key=int.bit_length)
+        res = plain[0]
+        for bits in plain[1:]:
+            if not res:
+                break
+            res &= bits
+        return res & ~excluded, False
+
+    def __contains__(self, element):
+        return all(element in term for term in self.terms)
@@ -0,0 +1,73 @@
+import threading
+
+import pytest
+
+from concurrent_uintset import ConcurrentUintSet
+from uintset import UintSet, INVALID_ELEMENT_MSG, INVALID_ITER_ARG_MSG
+
+
+def test_add_contains_discard():
+    s = ConcurrentUintSet()
+    s.add(3)
+    s.add(2 ** 20)
+    assert 3 in s
+    assert 2 ** 20 in s
+    assert 4 not in s
+    s.discard(3)
+    s.discard(5)
+    assert 3 not in s
+    assert len(s) == 1
+
+
+@pytest.mark.parametrize("elem, exception", [(-1, ValueError), (1.0, TypeError)])
+def test_add_invalid(elem, exception):
+    s = ConcurrentUintSet()
+    with pytest.raises(exception) as e:
+        s.add(elem)
+    assert e.value.args[0] == INVALID_ELEMENT_MSG
+
+
+def test_update_not_iterable():
+    s = ConcurrentUintSet()
+    with pytest.raises(TypeError) as e:
+        s.update(1)
+    assert e.value.args[0] == INVALID_ITER_ARG_MSG
+
+
+def test_snapshot():
+    elements = [0, 1, 2 ** 16 - 1, 2 ** 16, 3 * 2 ** 16 + 7]
+    s = ConcurrentUintSet(elements)
+    got = s.snapshot()
+    assert got == UintSet(elements)
+    s.add(5)
+    assert 5 not in got
+    assert list(s) == sorted(elements + [5])
+    assert s == UintSet(elements + [5])
+
+
+def test_repr():
+    assert repr(ConcurrentUintSet()) == 'ConcurrentUintSet()'
+    assert repr(ConcurrentUintSet([2, 1])) == 'ConcurrentUintSet({1, 2})'
+
+
+def test_concurrent_writers():
+    s = ConcurrentUintSet(stripes=4)
+    threads = 8
+    per_thread = 2000
+
+    def work(start):
+        for e in range(start, threads * per_thread * 20, threads * 20):
+            s.add(e)
+
+    workers = [threading.Thread(target=work, args=(i * 3,)) for i in range(threads)]
+    for t in workers:
+        t.start()
+    snapshots = [s.snapshot() for _ in range(5)]
+    for t in workers:
+        t.join()
+    want = UintSet(e for i in range(threads)
+                   for e in range(i * 3, threads * per_thread * 20, threads * 20))
+    assert len(s) == threads * per_thread
+    assert s.snapshot() == want
+    for snapshot in snapshots:
+        assert snapshot & want == snapshot
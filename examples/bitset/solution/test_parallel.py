@@ -0,0 +1,88 @@
+import random
+
+import pytest
+
+import parallel
+from parallel import SharedUintSet
+from uintset import UintSet
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(parallel, 'MIN_CHUNK', 64)
+
+
+@pytest.fixture(params=['numpy', 'int'])
+def engine(request, monkeypatch):
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(parallel, 'numpy', None)
+
+
+def random_uintset(nbits, seed):
+    rnd = random.Random(seed)
+    res = UintSet()
+    res._bigint = rnd.getrandbits(nbits)
+    return res
+
+
+operands = [
+        (10 ** 4, 10 ** 4),
+        (10 ** 4, 3 * 10 ** 3 + 5),
+        (3 * 10 ** 3 + 5, 10 ** 4),
+        (10 ** 4, 0),
+    ]
+
+@pytest.mark.parametrize("op, want", [
+        ('union', lambda a, b: a | b),
+        ('intersection', lambda a, b: a & b),
+        ('difference', lambda a, b: a - b),
+        ('symmetric_difference', lambda a, b: a ^ b),
+    ])
+@pytest.mark.parametrize("first_bits, second_bits", operands)
+@pytest.mark.parametrize("processes", [1, 2])
+def test_combine(small_chunks, engine, op, want, first_bits, second_bits, processes):
+    first, second = random_uintset(first_bits, 1), random_uintset(second_bits, 2)
+    with SharedUintSet.from_uintset(first) as a, SharedUintSet.from_uintset(second) as b:
+        with getattr(parallel, op)(a, b, processes=processes) as got:
+            assert got.to_uintset() == want(first, second)
+
+
+def test_round_trip():
+    s = UintSet([0, 63, 64, 2 ** 20])
+    with SharedUintSet.from_uintset(s) as shared:
+        assert shared.nbytes % parallel.WORD_BYTES == 0
+        assert shared.to_uintset() == s
+        assert len(shared) == 4
+    with SharedUintSet.from_uintset(UintSet()) as shared:
+        assert shared.nbytes == 0
+        assert shared.to_uintset() == UintSet()
+
+
+def test_combine_errors():
+    with SharedUintSet() as empty:
+        with pytest.raises(ValueError):
+            parallel.combine('add', empty, empty)
+        with pytest.raises(TypeError) as e:
+            parallel.union(empty, UintSet([1, 2]))
+        assert e.value.args[0] == parallel.INVALID_ARGS_MSG
+        with pytest.raises(TypeError):
+            parallel.count(UintSet([1]))
+
+
+@pytest.mark.parametrize("nbits", [0, 100, 10 ** 4 + 3])
+@pytest.mark.parametrize("processes", [1, 3])
+def test_count(small_chunks, engine, nbits, processes):
+    s = random_uintset(nbits, 3)
+    with SharedUintSet.from_uintset(s) as shared:
+        assert parallel.count(shared, processes=processes) == len(s)
+
+
+def test_ranges_aligned(small_chunks):
+    ranges = parallel._ranges(1000, 2)
+    assert ranges[0][0] == 0
+    assert ranges[-1][1] == 1000
+    for (start, stop), (next_start, _) in zip(ranges, ranges[1:]):
+        assert stop == next_start
+        assert start % parallel.WORD_BYTES == 0
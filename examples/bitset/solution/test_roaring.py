@@ -0,0 +1,172 @@
+import tracemalloc
+
+import pytest
+
+from roaring import RoaringUintSet, ArrayContainer, BitmapContainer, RunContainer
+from uintset import UintSet
+from uintset import INVALID_ELEMENT_MSG, INVALID_ITER_ARG_MSG
+
+
+def test_len():
+    s = RoaringUintSet()
+    assert len(s) == 0
+
+
+def test_add_multiple():
+    s = RoaringUintSet()
+    s.add(1)
+    s.add(3)
+    s.add(1)
+    s.add(2**30)
+    assert len(s) == 3
+    assert list(s) == [1, 3, 2**30]
+
+
+def test_not_number():
+    s = RoaringUintSet()
+    with pytest.raises(TypeError) as e:
+        s.add('A')
+    assert e.value.args[0] == INVALID_ELEMENT_MSG
+
+
+def test_add_negative():
+    s = RoaringUintSet()
+    with pytest.raises(ValueError) as e:
+        s.add(-1)
+    assert e.value.args[0] == INVALID_ELEMENT_MSG
+
+
+def test_contains():
+    s = RoaringUintSet([0, 70_000, 2**40])
+    assert 0 in s
+    assert 1 not in s
+    assert 70_000 in s
+    assert 2**40 in s
+    assert 2**40 + 1 not in s
+
+
+def test_repr():
+    s = RoaringUintSet([1, 5, 0, 70_000])
+    assert repr(s) == 'RoaringUintSet({0, 1, 5, 70000})'
+
+
+def test_sparse_chunk_uses_array():
+    s = RoaringUintSet([2**30])
+    assert isinstance(s._chunks[2**30 >> 16], ArrayContainer)
+    assert s.memory_usage() < 1000
+    assert UintSet([2**30]).memory_usage() > 2**27
+
+
+def test_dense_chunk_becomes_bitmap():
+    s = RoaringUintSet()
+    for e in range(0, 20_000, 2):
+        s.add(e)
+    assert isinstance(s._chunks[0], BitmapContainer)
+    assert len(s) == 10_000
+    assert 19_998 in s and 19_999 not in s
+
+
+@pytest.mark.parametrize("start, stop", [
+    (0, 0),
+    (3, 10),
+    (65_530, 65_540),
+    (10, 300_000),
+])
+def test_from_range(start, stop):
+    s = RoaringUintSet.from_range(start, stop)
+    assert list(s) == list(range(start, stop))
+    assert all(isinstance(c, RunContainer) for c in s._chunks.values())
+
+
+def test_optimize_picks_runs():
+    s = RoaringUintSet()
+    for e in range(5000):
+        s.add(e)
+    assert isinstance(s._chunks[0], BitmapContainer)
+    s.optimize()
+    assert isinstance(s._chunks[0], RunContainer)
+    assert list(s) == list(range(5000))
+
+
+@pytest.mark.parametrize("elements", [
+    [],
+    [1, 100],
+    list(range(0, 200_000, 3)),
+    [5, 70_000, 2**20],
+])
+def test_uintset_round_trip(elements):
+    s = RoaringUintSet(elements)
+    assert s == UintSet(elements)
+    assert s.to_uintset() == UintSet(elements)
+    assert RoaringUintSet.from_uintset(UintSet(elements)) == s
+
+
+union_cases = [
+        ([], [], []),
+        ([1], [], [1]),
+        ([1, 2**20], [100, 1], [1, 100, 2**20]),
+        (range(0, 10_000), range(5_000, 70_000), range(0, 70_000)),
+    ]
+
+
+@pytest.mark.parametrize("first, second, want", union_cases)
+def test_or_op(first, second, want):
+    got = RoaringUintSet(first) | RoaringUintSet(second)
+    assert list(got) == list(want)
+
+
+@pytest.mark.parametrize("first, second, want", union_cases)
+def test_union_iterable(first, second, want):
+    got = RoaringUintSet(first).union(list(second))
+    assert list(got) == list(want)
+
+
+def test_union_not_iterable():
+    with pytest.raises(TypeError) as e:
+        RoaringUintSet().union(1)
+    assert e.value.args[0] == INVALID_ITER_ARG_MSG
+
+
+intersection_cases = [
+        ([], [], []),
+        ([1], [], []),
+        ([1, 2**20], [100, 1], [1]),
+        (range(0, 10_000), range(5_000, 70_000), range(5_000, 10_000)),
+    ]
+
+
+@pytest.mark.parametrize("first, second, want", intersection_cases)
+def test_and_op(first, second, want):
+    got = RoaringUintSet(first) & RoaringUintSet(second)
+    assert list(got) == list(want)
+
+
+@pytest.mark.parametrize("first, second, want", intersection_cases)
+def test_intersection(first, second, want):
+    got = RoaringUintSet(first).intersection(second)
+    assert list(got) == list(want)
+
+
+@pytest.mark.parametrize("roaring, uintset, want", [
+    (RoaringUintSet(), UintSet(), True),
+    (RoaringUintSet([1]), UintSet(), False),
+    (RoaringUintSet(), UintSet([1]), False),
+    (RoaringUintSet([1, 70_000]), UintSet([1, 70_000]), True),
+    (RoaringUintSet([1, 70_000]), UintSet([2, 70_000]), False),
+    (RoaringUintSet([1, 70_000]), UintSet([1, 70_001]), False),
+    (RoaringUintSet([2**33]), UintSet([1]), False),
+])
+def test_eq_uintset(roaring, uintset, want):
+    assert (roaring == uintset) == want
+    assert (uintset == roaring) == want
+
+
+def test_eq_uintset_stays_sparse():
+    tracemalloc.start()
+    try:
+        assert RoaringUintSet([2**40]) != UintSet([1])
+        assert UintSet([1]) != RoaringUintSet([2**40])
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert peak < 2**20
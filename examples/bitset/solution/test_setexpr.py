@@ -0,0 +1,81 @@
+import pytest
+
+from empty import Empty
+from natural import N
+from setexpr import Complement, Intersection, Leaf, Union, lazy, UNBOUNDED_MSG
+from uintset import UintSet
+
+
+A = UintSet([1, 2, 5])
+B = UintSet([2, 3, 4, 5])
+C = UintSet([3, 5])
+
+
+def test_invert_builds_expression():
+    expr = ~A
+    assert isinstance(expr, Complement)
+    assert 0 in expr
+    assert 1 not in expr
+
+
+def test_invert_constants():
+    assert ~N is Empty
+    assert ~Empty is N
+
+
+def test_lazy_rejects_other_types():
+    with pytest.raises(TypeError):
+        lazy({1, 2})
+
+
+evaluate_cases = [
+        (lambda: A | B & ~C, UintSet([1, 2, 4, 5])),
+        (lambda: (A | B) & ~C, UintSet([1, 2, 4])),
+        (lambda: lazy(A) & B & C, UintSet([5])),
+        (lambda: lazy(A) - C, UintSet([1, 2])),
+        (lambda: A - ~lazy(C), UintSet([5])),
+        (lambda: ~(~A | ~B), A & B),
+        (lambda: (~A | C) & B, UintSet([3, 4, 5])),
+        (lambda: lazy(A) | N & B, A | B),
+        (lambda: lazy(A) & (B | N), A),
+        (lambda: lazy(A) | Empty, A),
+        (lambda: lazy(A) & Empty, UintSet()),
+        (lambda: A & ~lazy(A), UintSet()),
+        (lambda: lazy(UintSet()) & A & B, UintSet()),
+    ]
+
+@pytest.mark.parametrize("build, want", evaluate_cases)
+def test_evaluate(build, want):
+    expr = build()
+    assert expr.evaluate() == want
+    for e in range(8):
+        assert (e in expr) == (e in want)
+
+
+simplify_cases = [
+        (lambda: lazy(A) | N, Leaf(N)),
+        (lambda: lazy(A) & Empty, Leaf(Empty)),
+        (lambda: lazy(A) | ~lazy(A), Leaf(N)),
+        (lambda: ~~lazy(A), Leaf(A)),
+        (lambda: ~lazy(N), Leaf(Empty)),
+        (lambda: (lazy(A) | B) | (lazy(C) | A), Union([Leaf(A), Leaf(B), Leaf(C)])),
+        (lambda: lazy(A) & N & B, Intersection([Leaf(A), Leaf(B)])),
+    ]
+
+@pytest.mark.parametrize("build, want", simplify_cases)
+def test_simplify(build, want):
+    assert build().simplify() == want
+
+
+@pytest.mark.parametrize("build", [lambda: ~A, lambda: lazy(A) | ~lazy(B), lambda: lazy(N)])
+def test_evaluate_unbounded(build):
+    with pytest.raises(ValueError) as e:
+        build().evaluate()
+    assert e.value.args[0] == UNBOUNDED_MSG
+
+
+def test_evaluate_returns_new_set():
+    got = (lazy(A) | Empty).evaluate()
+    assert got == A
+    got.add(100)
+    assert 100 not in A
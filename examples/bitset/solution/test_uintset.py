@@ -1,7 +1,13 @@
+import itertools
+import tracemalloc
+from array import array
+
 import pytest
 
-from uintset import UintSet
-from uintset import INVALID_ELEMENT_MSG, INVALID_ITER_ARG_MSG
+import uintset
+from uintset import UintSet, FrozenUintSet, MappedUintSet
+from uintset import INVALID_ELEMENT_MSG, INVALID_ITER_ARG_MSG, INVALID_FORMAT_MSG
+from uintset import IMMUTABLE_MSG
 
 
 def test_len():
@@ -61,11 +67,483 @@ def test_new_from_empty_iterable():
     assert len(s) == 0
 
 
+def test_new_from_iterable_errors():
+    with pytest.raises(TypeError) as e:
+        UintSet([1, 'A'])
+    assert e.value.args[0] == INVALID_ELEMENT_MSG
+    with pytest.raises(ValueError) as e:
+        UintSet([1, -1])
+    assert e.value.args[0] == INVALID_ELEMENT_MSG
+
+
+def test_from_iterable():
+    s = UintSet.from_iterable(iter([100, 3, 1, 3]))
+    assert s == UintSet([1, 3, 100])
+
+
+@pytest.mark.parametrize("start, stop, want", [
+    (0, 0, []),
+    (5, 3, []),
+    (0, 3, [0, 1, 2]),
+    (62, 66, [62, 63, 64, 65]),
+])
+def test_from_range(start, stop, want):
+    s = UintSet.from_range(start, stop)
+    assert list(s) == want
+
+
+def test_from_range_negative():
+    with pytest.raises(ValueError) as e:
+        UintSet.from_range(-1, 3)
+    assert e.value.args[0] == INVALID_ELEMENT_MSG
+
+
+@pytest.mark.parametrize("typecode", ['B', 'H', 'I', 'L', 'Q', 'b', 'q'])
+def test_from_array(typecode):
+    s = UintSet.from_array(array(typecode, [5, 0, 100, 5]))
+    assert s == UintSet([0, 5, 100])
+
+
+def test_from_array_empty():
+    assert UintSet.from_array(array('Q')) == UintSet()
+
+
+def test_from_array_negative():
+    with pytest.raises(ValueError) as e:
+        UintSet.from_array(array('q', [1, -1]))
+    assert e.value.args[0] == INVALID_ELEMENT_MSG
+
+
+def test_from_array_float():
+    with pytest.raises(TypeError) as e:
+        UintSet.from_array(array('d', [1.0]))
+    assert e.value.args[0] == INVALID_ELEMENT_MSG
+
+
 def test_iter():
     s = UintSet([1, 5, 0, 3, 2, 4])
     assert list(s) == [0, 1, 2, 3, 4, 5]
 
 
+rank_sets = [
+    [],
+    [0],
+    [1, 3, 5, 100],
+    list(range(0, 100_000, 7)),  # several index blocks
+    [2**20, 2**20 + 1],
+]
+
+
+@pytest.mark.parametrize("elements", rank_sets)
+def test_rank(elements):
+    s = UintSet(elements)
+    probes = set(elements[::50]) | {0, 1, 2, 99, 101, 50_000, 2**20 + 5}
+    for x in sorted(probes):
+        assert s.rank(x) == sum(1 for e in elements if e < x)
+
+
+@pytest.mark.parametrize("elements", rank_sets)
+def test_select(elements):
+    s = UintSet(elements)
+    want = sorted(elements)
+    for k in range(0, len(want), max(len(want) // 50, 1)):
+        assert s.select(k) == want[k]
+    if want:
+        assert s.select(-1) == want[-1]
+
+
+def test_select_out_of_range():
+    s = UintSet([1, 2])
+    with pytest.raises(IndexError):
+        s.select(2)
+    with pytest.raises(IndexError):
+        s.select(-3)
+
+
+def test_rank_after_change():
+    s = UintSet([1, 2])
+    assert s.rank(10) == 2
+    s.add(5)
+    assert s.rank(10) == 3
+    assert s.select(2) == 5
+
+
+def test_rank_negative():
+    with pytest.raises(ValueError) as e:
+        UintSet().rank(-1)
+    assert e.value.args[0] == INVALID_ELEMENT_MSG
+
+
+@pytest.mark.parametrize("method", ['rank', 'select'])
+def test_rank_select_not_int(method):
+    with pytest.raises(TypeError) as e:
+        getattr(UintSet([1, 2]), method)(0.5)
+    assert e.value.args[0] == INVALID_ELEMENT_MSG
+
+
+def test_min_max():
+    s = UintSet([70, 3, 1000])
+    assert s.min() == 3
+    assert s.max() == 1000
+
+
+@pytest.mark.parametrize("method", ['min', 'max'])
+def test_min_max_empty(method):
+    with pytest.raises(ValueError):
+        getattr(UintSet(), method)()
+
+
+@pytest.mark.parametrize("lo, hi, want", [
+    (0, 0, []),
+    (0, 1000, [0, 7, 8, 63, 64, 500]),
+    (7, 64, [7, 8, 63]),
+    (8, 9, [8]),
+    (501, 10**9, []),
+    (-5, 8, [0, 7]),
+])
+def test_slice(lo, hi, want):
+    s = UintSet([0, 7, 8, 63, 64, 500])
+    assert list(s.slice(lo, hi)) == want
+
+
+@pytest.mark.parametrize("elements", [[], [0], [1, 100, 2**20]])
+def test_bytes_round_trip(elements):
+    s = UintSet(elements)
+    got = UintSet.from_buffer(s.to_bytes())
+    assert got == s
+
+
+def test_from_buffer_offset():
+    first, second = UintSet([1, 2]), UintSet([300])
+    data = bytearray(first.to_bytes() + second.to_bytes())
+    assert UintSet.from_buffer(data, len(first.to_bytes())) == second
+
+
+@pytest.mark.parametrize("data", [b'', b'NOPE' + bytes(20), UintSet([100]).to_bytes()[:-1]])
+def test_from_buffer_invalid(data):
+    with pytest.raises(ValueError) as e:
+        UintSet.from_buffer(data)
+    assert e.value.args[0] == INVALID_FORMAT_MSG
+
+
+def test_mapped(tmp_path):
+    s = UintSet([0, 9, 100, 2**20])
+    path = tmp_path / 'set.bin'
+    path.write_bytes(UintSet([5]).to_bytes() + s.to_bytes())
+    with MappedUintSet(path, offset=len(UintSet([5]).to_bytes())) as mapped:
+        assert len(mapped) == 4
+        assert 9 in mapped
+        assert 10 not in mapped
+        assert 2**40 not in mapped
+        assert list(mapped) == [0, 9, 100, 2**20]
+        assert mapped.to_uintset() == s
+
+
+def test_mapped_invalid(tmp_path):
+    path = tmp_path / 'set.bin'
+    path.write_bytes(b'garbage' * 10)
+    with pytest.raises(ValueError) as e:
+        MappedUintSet(path)
+    assert e.value.args[0] == INVALID_FORMAT_MSG
+
+
+def test_contains_many():
+    s = UintSet([0, 9, 100])
+    got = s.contains_many([9, 10, 0, 100, 2**40])
+    assert got == [True, False, True, True, False]
+
+
+@pytest.mark.parametrize("elements", [range(5, 12), array('Q', [5, 9, 11]), (9, 5)])
+def test_contains_many_batches(elements):
+    s = UintSet([5, 9])
+    assert s.contains_many(elements) == [e in s for e in elements]
+
+
+def test_contains_mask():
+    s = UintSet([0, 9, 100])
+    assert s.contains_mask([9, 10, 0, 100, 2**40]) == 0b01101
+    assert s.contains_mask(range(0, 12)) == 1 << 0 | 1 << 9
+    assert s.contains_mask([]) == 0
+
+
+def test_contains_many_small_batch():
+    s = UintSet.from_range(0, 2 ** 24)  # a 2 MB bitmap
+    tracemalloc.start()
+    try:
+        assert s.contains_many([3, 70, 2 ** 30]) == [True, True, False]
+        assert s.contains_mask([3, 70, 2 ** 30]) == 0b011
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert peak < 2 ** 16
+
+
+@pytest.mark.parametrize("method", ['contains_many', 'contains_mask', 'update'])
+def test_batch_errors(method):
+    s = UintSet([1])
+    with pytest.raises(TypeError) as e:
+        getattr(s, method)([1, 2.0])
+    with pytest.raises(ValueError) as e:
+        getattr(s, method)([1, -1])
+    with pytest.raises(ValueError) as e:
+        getattr(s, method)(range(-1, 3))
+
+
+@pytest.mark.parametrize("elements", [range(3, 10, 3), array('I', [3, 6, 9]), iter([9, 6, 3])])
+def test_update_batches(elements):
+    s = UintSet([1])
+    s.update(elements)
+    assert s == UintSet([1, 3, 6, 9])
+
+
+@pytest.mark.parametrize("values", [[], [0], [3, 1, 9], [2 ** 20, 5, 5]])
+def test_from_numpy_indices(values):
+    numpy = pytest.importorskip('numpy')
+    got = UintSet.from_numpy(numpy.array(values, dtype=numpy.int64))
+    assert got == UintSet(values)
+
+
+def test_from_numpy_mask():
+    numpy = pytest.importorskip('numpy')
+    mask = numpy.array([False, True, False, False, True, False, False, False, False, True])
+    assert UintSet.from_numpy(mask) == UintSet([1, 4, 9])
+
+
+@pytest.mark.parametrize("values, exception", [
+        ([1, -1], ValueError),
+        ([1.0, 2.0], TypeError),
+    ])
+def test_from_numpy_invalid(values, exception):
+    numpy = pytest.importorskip('numpy')
+    with pytest.raises(exception) as e:
+        UintSet.from_numpy(numpy.array(values))
+    assert e.value.args[0] == INVALID_ELEMENT_MSG
+
+
+@pytest.mark.parametrize("elements", [[], [0], [1, 4, 9], [0, 7, 8, 2 ** 16]])
+def test_to_numpy(elements):
+    numpy = pytest.importorskip('numpy')
+    s = UintSet(elements)
+    assert s.to_numpy().tolist() == elements
+    assert numpy.asarray(s).tolist() == elements
+    assert numpy.asarray(s, dtype=numpy.uint32).dtype == numpy.uint32
+    assert UintSet.from_numpy(s.to_mask()) == s
+
+
+def test_to_mask_length():
+    pytest.importorskip('numpy')
+    s = UintSet([1, 4, 9])
+    assert s.to_mask().tolist() == [i in s for i in range(10)]
+    assert s.to_mask(12).tolist() == [i in s for i in range(12)]
+    assert s.to_mask(5).tolist() == [False, True, False, False, True]
+    assert UintSet().to_mask(3).tolist() == [False] * 3
+    with pytest.raises(ValueError):
+        UintSet([1, 9]).to_mask(-1)
+
+
+def test_from_numpy_empty():
+    numpy = pytest.importorskip('numpy')
+    assert UintSet.from_numpy([]) == UintSet()
+    assert UintSet.from_numpy(numpy.array([])) == UintSet()
+
+
+comparison_cases = [
+        # first, second, subset, disjoint
+        (UintSet(), UintSet(), True, True),
+        (UintSet(), UintSet([1]), True, True),
+        (UintSet([1]), UintSet(), False, True),
+        (UintSet([1, 3]), UintSet([1, 2, 3]), True, False),
+        (UintSet([1, 2, 3]), UintSet([1, 3]), False, False),
+        (UintSet([1, 3]), UintSet([1, 3]), True, False),
+        (UintSet([0, 2]), UintSet([1, 3]), False, True),
+        (UintSet([5]), UintSet([1, 100]), False, True),
+    ]
+
+@pytest.mark.parametrize("first, second, subset, disjoint", comparison_cases)
+def test_comparisons(first, second, subset, disjoint):
+    a, b = set(first), set(second)
+    assert first.issubset(second) == subset == (a <= b)
+    assert second.issuperset(first) == subset
+    assert first.isdisjoint(second) == disjoint == a.isdisjoint(b)
+    assert (first <= second) == (a <= b)
+    assert (first < second) == (a < b)
+    assert (first >= second) == (a >= b)
+    assert (first > second) == (a > b)
+
+
+def test_comparisons_iterable():
+    s = UintSet([1, 3])
+    assert s.issubset([3, 2, 1])
+    assert s.issuperset(iter([1]))
+    assert s.isdisjoint(range(4, 10))
+    with pytest.raises(TypeError) as e:
+        s.issubset(1)
+    assert e.value.args[0] == INVALID_ITER_ARG_MSG
+
+
+def test_comparison_not_uintset():
+    with pytest.raises(TypeError):
+        UintSet([1]) <= {1, 2}
+
+
+def test_frozen_hash_and_eq():
+    frozen = FrozenUintSet([1, 2 ** 16])
+    assert frozen == UintSet([1, 2 ** 16])
+    assert UintSet([1, 2 ** 16]) == frozen
+    assert hash(frozen) == hash(FrozenUintSet.from_iterable([2 ** 16, 1]))
+    cache = {frozen: 'seen'}
+    assert cache[FrozenUintSet([1, 2 ** 16])] == 'seen'
+    with pytest.raises(TypeError):
+        hash(UintSet([1]))
+
+
+@pytest.mark.parametrize("method, args", [
+        ('add', (1,)),
+        ('discard', (1,)),
+        ('remove', (1,)),
+        ('update', ([1],)),
+        ('intersection_update', ([1],)),
+        ('difference_update', ([1],)),
+        ('symmetric_difference_update', ([1],)),
+    ])
+def test_frozen_mutators(method, args):
+    frozen = FrozenUintSet([1, 2])
+    with pytest.raises(TypeError) as e:
+        getattr(frozen, method)(*args)
+    assert e.value.args[0] == IMMUTABLE_MSG
+    assert frozen == UintSet([1, 2])
+
+
+def test_frozen_operators():
+    frozen = FrozenUintSet([1, 2])
+    other = UintSet([2, 3])
+    alias = frozen
+    frozen |= other
+    assert alias == UintSet([1, 2])
+    assert frozen == UintSet([1, 2, 3])
+    assert isinstance(frozen, FrozenUintSet)
+    assert isinstance(alias - other, FrozenUintSet)
+    assert alias.union([7]) == UintSet([1, 2, 7])
+    assert alias.intersection([2]) == UintSet([2])
+    assert alias.difference([2]) == UintSet([1])
+    assert alias.symmetric_difference([2, 5]) == UintSet([1, 5])
+    assert isinstance(alias.union([7]), FrozenUintSet)
+    assert repr(alias) == 'FrozenUintSet({1, 2})'
+
+
+def test_len_incremental(monkeypatch):
+    s = UintSet([1, 5])
+    assert len(s) == 2
+
+    def fail(bigint):
+        raise AssertionError('count_ones called')
+
+    monkeypatch.setattr(uintset.bitops, 'count_ones', fail)
+    s.add(7)
+    s.add(7)
+    s.add(1)
+    s.discard(5)
+    s.discard(100)
+    s.remove(1)
+    assert len(s) == 1
+    assert bool(s)
+    s.discard(7)
+    assert len(s) == 0
+    assert not s
+
+
+def test_len_after_bulk_ops():
+    s = UintSet([1, 2, 3])
+    assert len(s) == 3
+    s |= UintSet([3, 4, 5])
+    assert len(s) == 5
+    s &= UintSet([1, 5, 9])
+    assert len(s) == 2
+    s.update(range(10, 20))
+    assert len(s) == 12
+    s ^= UintSet([1, 10])
+    assert len(s) == 10
+    s -= UintSet(range(15, 30))
+    assert len(s) == 5
+    s.add(100)
+    assert len(s) == 6
+
+
+@pytest.mark.parametrize("mutate", [
+        lambda s: s.__ior__(UintSet([1])),
+        lambda s: s.__iand__(UintSet([1])),
+        lambda s: s.__isub__(UintSet([1])),
+        lambda s: s.__ixor__(UintSet([1])),
+        lambda s: s.update([1]),
+        lambda s: s.intersection_update([1]),
+        lambda s: s.difference_update([1]),
+        lambda s: s.symmetric_difference_update([1]),
+    ])
+def test_len_keeps_no_old_bitmap(mutate):
+    s = UintSet([1, 2 ** 16])
+    assert len(s) == 2
+    mutate(s)
+    assert s._count is None
+    assert len(s) == len(set(s))
+
+
+def test_from_buffer_bad_count():
+    data = bytearray(UintSet([1, 2]).to_bytes())
+    data[16:24] = (9).to_bytes(8, 'little')  # 9 elements in a 1 byte bitmap
+    with pytest.raises(ValueError) as e:
+        UintSet.from_buffer(data)
+    assert e.value.args[0] == INVALID_FORMAT_MSG
+
+
+def test_len_from_buffer():
+    s = UintSet.from_buffer(UintSet([3, 2 ** 20]).to_bytes())
+    assert len(s) == 2
+    s.add(4)
+    assert len(s) == 3
+
+
+@pytest.mark.parametrize("elements, want", [([], False), ([0], True), ([2 ** 16], True)])
+def test_bool(elements, want):
+    assert bool(UintSet(elements)) == want
+
+
+@pytest.mark.parametrize("mutate", [
+        lambda s: s.add(3),
+        lambda s: s.discard(700),
+        lambda s: s.__iand__(UintSet([1])),
+        lambda s: s.update([5]),
+        lambda s: s.symmetric_difference_update([1]),
+    ])
+def test_rank_index_reset(mutate):
+    s = UintSet(range(0, 2 ** 20 + 1, 7))
+    assert s.rank(2 ** 19) == len(range(0, 2 ** 19, 7))
+    assert s._rank_bytes is not None
+    mutate(s)
+    assert s._rank_bytes is None and s._rank_counts is None
+    assert s.rank(2 ** 21) == len(s)
+    assert not s or s.select(-1) == s.max()
+
+
+def test_slice_bounds():
+    s = UintSet([1, 8, 9, 2 ** 16])
+    assert list(s.slice(0, 2 ** 40)) == [1, 8, 9, 2 ** 16]
+    assert list(s.slice(-5, 9)) == [1, 8]
+    assert list(s.slice(9, 9)) == []
+
+
+def test_mapped_close_during_iteration(tmp_path):
+    path = tmp_path / 'set.bin'
+    elements = [1, 2 ** 20, 2 ** 20 + 3]
+    path.write_bytes(UintSet(elements).to_bytes())
+    m = MappedUintSet(str(path))
+    assert list(m) == elements
+    it = iter(m)
+    assert next(it) == 1
+    m.close()
+    with pytest.raises(ValueError):
+        next(it)
+
+
 def test_repr_empty():
     s = UintSet()
     assert repr(s) == 'UintSet()'
@@ -152,17 +630,6 @@ def test_intersection(first, second, want):
     got = first.intersection(second)
     assert got == want
 
-'''
-
-
-
-
-
-
-
-
-
-
 
 @pytest.fixture
 def symmetric_diff_cases():
@@ -250,6 +717,137 @@ def test_remove_not_found_2():
     assert str(excinfo.value) == str(elem)
 
 
+@pytest.mark.parametrize("first, second, want", union_cases)
+def test_ior_op(first, second, want):
+    s = UintSet(first)
+    s |= second
+    assert s == want
+
+
+def test_ior_op_keeps_identity():
+    s = UintSet([1])
+    t = s
+    s |= UintSet([2])
+    assert s is t
+    assert s == UintSet([1, 2])
+
+
+@pytest.mark.parametrize("first, second, want", union_cases)
+def test_update(first, second, want):
+    s = UintSet(first)
+    s.update(list(second))
+    assert s == want
+
+
+def test_union_does_not_mutate():
+    s = UintSet([1])
+    s.union([2])
+    assert s == UintSet([1])
+
+
+@pytest.mark.parametrize("first, second, want", intersection_cases)
+def test_iand_op(first, second, want):
+    s = UintSet(first)
+    s &= second
+    assert s == want
+
+
+@pytest.mark.parametrize("first, second, want", intersection_cases)
+def test_intersection_update(first, second, want):
+    s = UintSet(first)
+    s.intersection_update(list(second))
+    assert s == want
+
+
+def test_intersection_many_operands():
+    s = UintSet(range(100))
+    others = [UintSet(range(i, 100)) for i in range(0, 50, 5)]
+    got = s.intersection(*others, range(90), [45, 47, 49, 1000])
+    assert got == UintSet([45, 47, 49])
+
+
+def test_intersection_empty_short_circuits():
+    got = UintSet([1, 2]).intersection(UintSet(), itertools.count())
+    assert got == UintSet()
+
+
+def test_intersection_iterable_not_materialized():
+    got = UintSet([1, 2]).intersection([2, 2**40])
+    assert got == UintSet([2])
+
+
+def test_intersection_not_iterable():
+    with pytest.raises(TypeError) as e:
+        UintSet([1]).intersection(1)
+    assert e.value.args[0] == INVALID_ITER_ARG_MSG
+
+
+def test_union_many_operands():
+    got = UintSet([1]).union([2], UintSet([3]), (4, 2**20), UintSet())
+    assert got == UintSet([1, 2, 3, 4, 2**20])
+
+
+def test_intersection_iterable_multiple():
+    s = UintSet([1, 2, 3, 4, 5])
+    got = s.intersection([2, 3, 4], {3, 4, 10})
+    assert got == UintSet([3, 4])
+
+
+def test_ixor_op(symmetric_diff_cases):
+    for s1, s2, want in symmetric_diff_cases:
+        s = UintSet(s1)
+        s ^= s2
+        assert s == want
+
+
+def test_symmetric_difference_update(symmetric_diff_cases):
+    for s1, s2, want in symmetric_diff_cases:
+        s = UintSet(s1)
+        s.symmetric_difference_update(list(s2))
+        assert s == want
+
+
+def test_isub_op(difference_cases):
+    for s1, s2, want in difference_cases:
+        s = UintSet(s1)
+        s -= s2
+        assert s == want
+
+
+def test_difference_update(difference_cases):
+    for s1, s2, want in difference_cases:
+        s = UintSet(s1)
+        s.difference_update(list(s2))
+        assert s == want
+
+
+def test_difference_multiple():
+    s = UintSet([1, 2, 3, 4, 5])
+    got = s.difference([2], UintSet([4, 5]))
+    assert got == UintSet([1, 3])
+
+
+def test_discard():
+    s = UintSet([1, 2, 3])
+    s.discard(2)
+    s.discard(100)
+    assert s == UintSet([1, 3])
+
+
+def test_discard_negative():
+    s = UintSet()
+    with pytest.raises(ValueError) as e:
+        s.discard(-1)
+    assert e.value.args[0] == INVALID_ELEMENT_MSG
+
+
+def test_binary_ops_need_uintset():
+    s = UintSet([1])
+    for op in ('__or__', '__and__', '__sub__', '__xor__'):
+        assert getattr(s, op)([1]) is NotImplemented
+
+
+'''
 def test_pop_not_found():
     s = UintSet()
     with pytest.raises(KeyError) as excinfo:
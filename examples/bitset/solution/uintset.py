@@ -1,23 +1,223 @@
+import itertools
+import mmap
+import struct
+import sys
+from array import array
+from bisect import bisect_right
+
 import bitops
 
 
 INVALID_ELEMENT_MSG = "'UintSet' elements must be integers >= 0"
 INVALID_ITER_ARG_MSG = "expected UintSet or iterable argument"
+IMMUTABLE_MSG = "'FrozenUintSet' object does not support mutation"
+UNSIGNED_TYPECODES = 'BHILQ'
+RANK_BLOCK_SIZE = 2 ** 12  # bytes per block of the rank index
+
+# serialized form: magic, version, bitmap size in bytes, element count,
+# then the bitmap as little-endian bytes
+HEADER = struct.Struct('<4sB3xQQ')
+MAGIC = b'UINT'
+VERSION = 1
+INVALID_FORMAT_MSG = 'not a serialized UintSet'
+
+
+def validate_batch(elements):
+    """Check a batch of elements in one go and return it as a sequence.
+
+    Ranges and unsigned arrays are valid by construction; other batches
+    are checked with one pass over their types and one ``min()``.
+    """
+    if isinstance(elements, range):
+        if elements and min(elements[0], elements[-1]) < 0:
+            raise ValueError(INVALID_ELEMENT_MSG)
+        return elements
+    if isinstance(elements, array):
+        if elements.typecode not in UNSIGNED_TYPECODES + UNSIGNED_TYPECODES.lower():
+            raise TypeError(INVALID_ELEMENT_MSG)
+        if elements.typecode.islower() and elements and min(elements) < 0:
+            raise ValueError(INVALID_ELEMENT_MSG)
+        return elements
+    if not isinstance(elements, (list, tuple)):
+        elements = list(elements)
+    if not all(issubclass(t, int) for t in set(map(type, elements))):
+        raise TypeError(INVALID_ELEMENT_MSG)
+    if elements and min(elements) < 0:
+        raise ValueError(INVALID_ELEMENT_MSG)
+    return elements
+
+
+def build_bigint(elements):
+    """Set the bits of all elements in a bytearray, convert it once."""
+    batch = validate_batch(elements)
+    if not batch:
+        return 0
+    buf = bytearray(max(batch) // 8 + 1)
+    for e in batch:
+        buf[e >> 3] |= 1 << (e & 7)
+    return int.from_bytes(buf, 'little')
+
+
+def probe_bigint(bigint, elements):
+    """Return the bits of ``bigint`` at the positions in ``elements``.
+
+    Only ``bigint``-sized buffers are used, however large the elements.
+    """
+    data = bigint.to_bytes((bigint.bit_length() + 7) // 8, 'little')
+    size = len(data)
+    buf = bytearray(size)
+    for e in elements:
+        try:
+            if e < 0:
+                raise ValueError(INVALID_ELEMENT_MSG)
+            byte = e >> 3
+        except TypeError:
+            raise TypeError(INVALID_ELEMENT_MSG)
+        if byte < size and data[byte] >> (e & 7) & 1:
+            buf[byte] |= 1 << (e & 7)
+    return int.from_bytes(buf, 'little')
+
 
 class UintSet:
 
     def __init__(self, elements=None):
         self._bigint = 0
+        self._rank_bytes = None
+        self._rank_counts = None
+        self._count = None
         if elements:
-            for e in elements:
-                self.add(e)
+            self._bigint = build_bigint(elements)
+
+    @classmethod
+    def from_iterable(cls, elements):
+        res = cls()
+        res._bigint = build_bigint(elements)
+        return res
+
+    @classmethod
+    def from_range(cls, start, stop):
+        if not (isinstance(start, int) and isinstance(stop, int)):
+            raise TypeError(INVALID_ELEMENT_MSG)
+        if start < 0:
+            raise ValueError(INVALID_ELEMENT_MSG)
+        res = cls()
+        if stop > start:
+            res._bigint = ((1 << (stop - start)) - 1) << start
+        return res
+
+    @classmethod
+    def from_array(cls, elements):
+        """Build from an ``array.array`` of integers, e.g. ``array('Q')``."""
+        if not isinstance(elements, array):
+            raise TypeError(INVALID_ITER_ARG_MSG)
+        res = cls()
+        res._bigint = build_bigint(elements)
+        return res
+
+    @classmethod
+    def from_numpy(cls, values):
+        """Build from a NumPy boolean mask or array of integer indices."""
+        import numpy
+        values = numpy.asarray(values).ravel()
+        if not values.size:  # NumPy makes empty input float64
+            return cls()
+        if values.dtype == numpy.bool_:
+            data = numpy.packbits(values, bitorder='little')
+        elif numpy.issubdtype(values.dtype, numpy.integer):
+            if values.min() < 0:
+                raise ValueError(INVALID_ELEMENT_MSG)
+            # a byte per 8 values up to the largest, no max + 1 bool mask
+            data = numpy.zeros(int(values.max()) // 8 + 1, dtype=numpy.uint8)
+            numpy.bitwise_or.at(data, values >> 3,
+                                numpy.left_shift(1, values & 7).astype(numpy.uint8))
+        else:
+            raise TypeError(INVALID_ELEMENT_MSG)
+        res = cls()
+        res._bigint = int.from_bytes(data, 'little')
+        return res
+
+    def _numpy_bytes(self):
+        import numpy
+        return numpy.frombuffer(self._data(), dtype=numpy.uint8)
+
+    def to_mask(self, length=None):
+        """Return a NumPy boolean array of ``length`` items, true at the elements.
+
+        ``length`` defaults to ``max(self) + 1``; larger elements are left out.
+        """
+        import numpy
+        if length is None:
+            length = self._bigint.bit_length()
+        elif length < 0:
+            raise ValueError('mask length must be >= 0')
+        data = self._numpy_bytes()
+        if not data.size:
+            return numpy.zeros(length, dtype=bool)
+        return numpy.unpackbits(data, count=length, bitorder='little').view(bool)
+
+    def to_numpy(self, dtype=None):
+        """Return the elements as a sorted NumPy array of indices."""
+        import numpy
+        data = self._numpy_bytes()
+        nonzero = numpy.flatnonzero(data)
+        if nonzero.size > data.size // 8:  # dense: unpacking everything is faster
+            indices = numpy.flatnonzero(numpy.unpackbits(data, bitorder='little'))
+        else:  # sparse: unpack only the nonzero bytes, not a bit per value up to max(self)
+            bits = numpy.unpackbits(data[nonzero, None], axis=1, bitorder='little')
+            rows, cols = numpy.nonzero(bits)
+            indices = nonzero[rows] * 8 + cols
+        return indices if dtype is None else indices.astype(dtype)
+
+    def __array__(self, dtype=None, copy=None):
+        return self.to_numpy(dtype)
+
+    def to_bytes(self):
+        bigint = self._bigint
+        data = bigint.to_bytes((bigint.bit_length() + 7) // 8, 'little')
+        return HEADER.pack(MAGIC, VERSION, len(data), len(self)) + data
+
+    @classmethod
+    def from_buffer(cls, buffer, offset=0):
+        """Load a set written by ``to_bytes`` from any bytes-like object."""
+        size, count = read_header(buffer, offset)
+        start = offset + HEADER.size
+        res = cls()
+        with memoryview(buffer) as view:
+            res._bigint = int.from_bytes(view[start:start + size], 'little')
+        res._count = count
+        return res
+
+    def memory_usage(self):
+        """Bytes used by the bitmap ``int``."""
+        return sys.getsizeof(self._bigint)
 
     def __len__(self):
-        return bitops.count_ones(self._bigint)
+        # add and discard keep the count up to date, bulk changes reset it
+        if self._count is None:
+            self._count = bitops.count_ones(self._bigint)
+        return self._count
+
+    def __bool__(self):
+        return self._bigint != 0
+
+    def _rebind(self, bigint, delta):
+        """Replace the bitmap by one with ``delta`` more elements."""
+        if self._count is not None:
+            self._count += delta
+        self._bigint = bigint
+        self._rank_bytes = self._rank_counts = None
+
+    def _replace(self, bigint):
+        """Rebind the bitmap after a bulk change, dropping what was derived from it."""
+        self._bigint = bigint
+        self._rank_bytes = self._rank_counts = None
+        self._count = None
 
     def add(self, elem):
         try:
-            self._bigint = bitops.set_bit(self._bigint, elem)
+            if bitops.get_bit(self._bigint, elem):
+                return
+            self._rebind(bitops.set_bit(self._bigint, elem), 1)
         except TypeError:
             raise TypeError(INVALID_ELEMENT_MSG)
         except ValueError:
@@ -31,61 +231,410 @@ class UintSet:
         except ValueError:
             raise ValueError(INVALID_ELEMENT_MSG)
 
+    def _hits(self, batch):
+        """Return the bits of the set at the elements of ``batch``, as little-endian bytes.
+
+        Only the bitmap bits up to the largest element of the batch are
+        read, however large the set.
+        """
+        bigint = self._bigint
+        nbits = bigint.bit_length()
+        hits = bigint & build_bigint([e for e in batch if e < nbits])
+        return hits.to_bytes((hits.bit_length() + 7) // 8, 'little')
+
+    def contains_many(self, elements):
+        """Return a list of bools: which elements are in the set."""
+        batch = validate_batch(elements)
+        data = self._hits(batch)
+        size = len(data)
+        return [e >> 3 < size and data[e >> 3] >> (e & 7) & 1 == 1 for e in batch]
+
+    def contains_mask(self, elements):
+        """Like ``contains_many``, as an int with bit i set for a hit on element i."""
+        batch = validate_batch(elements)
+        data = self._hits(batch)
+        size = len(data)
+        buf = bytearray((len(batch) + 7) // 8)
+        for i, e in enumerate(batch):
+            if e >> 3 < size and data[e >> 3] >> (e & 7) & 1:
+                buf[i >> 3] |= 1 << (i & 7)
+        return int.from_bytes(buf, 'little')
+
     def __iter__(self):
         return bitops.find_ones(self._bigint)
 
+    def _data(self):
+        """Return the bitmap as little-endian bytes, a temporary copy."""
+        bigint = self._bigint
+        return bigint.to_bytes((bigint.bit_length() + 7) // 8, 'little')
+
+    def _index_bytes(self):
+        """Return the bitmap bytes kept for rank, select and slice.
+
+        Every mutation drops them, with the block counts.
+        """
+        data = self._rank_bytes
+        if data is None:
+            data = self._rank_bytes = self._data()
+        return data
+
+    def _block_counts(self):
+        """Return the number of elements before each block of ``RANK_BLOCK_SIZE`` bytes."""
+        counts = self._rank_counts
+        if counts is None:
+            data = self._index_bytes()
+            counts = array('Q', [0])
+            for pos in range(0, len(data), RANK_BLOCK_SIZE):
+                block = int.from_bytes(data[pos:pos + RANK_BLOCK_SIZE], 'little')
+                counts.append(counts[-1] + bitops.count_ones(block))
+            self._rank_counts = counts
+        return counts
+
+    def _bits(self, start, stop):
+        """Return bits ``start`` to ``stop`` of the bitmap as an int.
+
+        Only the bytes holding them are read, not the whole bitmap.
+        """
+        data = self._index_bytes()
+        bits = int.from_bytes(data[start >> 3:(stop + 7) >> 3], 'little')
+        return (bits >> (start & 7)) & ((1 << (stop - start)) - 1)
+
+    def rank(self, elem):
+        """Return the number of elements smaller than ``elem``."""
+        if not isinstance(elem, int):
+            raise TypeError(INVALID_ELEMENT_MSG)
+        if elem < 0:
+            raise ValueError(INVALID_ELEMENT_MSG)
+        counts = self._block_counts()
+        block = (elem >> 3) // RANK_BLOCK_SIZE
+        if block >= len(counts) - 1:
+            return counts[-1]
+        start = block * RANK_BLOCK_SIZE * 8
+        return counts[block] + bitops.count_ones(self._bits(start, elem))
+
+    def select(self, k):
+        """Return the element at position ``k`` in ascending order."""
+        if not isinstance(k, int):
+            raise TypeError(INVALID_ELEMENT_MSG)
+        counts = self._block_counts()
+        total = counts[-1]
+        if k < 0:
+            k += total
+        if not 0 <= k < total:
+            raise IndexError('UintSet index out of range')
+        block = bisect_right(counts, k) - 1
+        start = block * RANK_BLOCK_SIZE * 8
+        bits = self._bits(start, start + RANK_BLOCK_SIZE * 8)
+        ones = itertools.islice(bitops.find_ones(bits), k - counts[block], None)
+        return start + next(ones)
+
+    def min(self):
+        if not self._bigint:
+            raise ValueError('min() of an empty UintSet')
+        return (self._bigint & -self._bigint).bit_length() - 1
+
+    def max(self):
+        if not self._bigint:
+            raise ValueError('max() of an empty UintSet')
+        return self._bigint.bit_length() - 1
+
+    def slice(self, lo, hi):
+        """Iterate over the elements ``e`` with ``lo <= e < hi``."""
+        lo = max(lo, 0)
+        hi = min(hi, self._bigint.bit_length())
+        if hi <= lo:
+            return
+        for e in bitops.find_ones(self._bits(lo, hi)):
+            yield lo + e
+
     def __repr__(self):
         elements = ', '.join(str(e) for e in self)
         if elements:
             elements = '{' + elements + '}'
-        return f'UintSet({elements})'
+        return f'{self.__class__.__name__}({elements})'
 
     def __eq__(self, other):
-        return isinstance(other, self.__class__) and self._bigint == other._bigint
+        if isinstance(other, UintSet):
+            return self._bigint == other._bigint
+        return NotImplemented
+
+    def issubset(self, other):
+        return bitops.is_subset(self._bigint, self._bigint_of(other))
+
+    def issuperset(self, other):
+        return bitops.is_subset(self._bigint_of(other), self._bigint)
+
+    def isdisjoint(self, other):
+        return bitops.is_disjoint(self._bigint, self._bigint_of(other))
+
+    def __le__(self, other):
+        if isinstance(other, UintSet):
+            return bitops.is_subset(self._bigint, other._bigint)
+        return NotImplemented
+
+    def __lt__(self, other):
+        if isinstance(other, UintSet):
+            return (self._bigint != other._bigint
+                    and bitops.is_subset(self._bigint, other._bigint))
+        return NotImplemented
+
+    def __ge__(self, other):
+        if isinstance(other, UintSet):
+            return bitops.is_subset(other._bigint, self._bigint)
+        return NotImplemented
+
+    def __gt__(self, other):
+        if isinstance(other, UintSet):
+            return (self._bigint != other._bigint
+                    and bitops.is_subset(other._bigint, self._bigint))
+        return NotImplemented
+
+    def __invert__(self):
+        import setexpr  # setexpr imports this module
+        return ~setexpr.lazy(self)
+
+    def discard(self, elem):
+        try:
+            bigint = bitops.unset_bit(self._bigint, elem)
+        except TypeError:
+            raise TypeError(INVALID_ELEMENT_MSG)
+        except ValueError:
+            raise ValueError(INVALID_ELEMENT_MSG)
+        if bigint is not self._bigint:  # unset_bit returns it as is when absent
+            self._rebind(bigint, -1)
+
+    def remove(self, elem):
+        if elem not in self:
+            raise KeyError(elem)
+        self.discard(elem)
+
+    def _bigint_of(self, other):
+        if isinstance(other, UintSet):
+            return other._bigint
+        try:
+            return build_bigint(other)
+        except TypeError:
+            raise TypeError(INVALID_ITER_ARG_MSG)
+
+    def _new(self, bigint):
+        res = self.__class__()
+        res._bigint = bigint
+        return res
 
     def __or__(self, other):
-        cls = self.__class__
-        if isinstance(other, cls):
-            res = cls()
-            res._bigint = self._bigint | other._bigint
-            return res
+        if isinstance(other, UintSet):
+            return self._new(self._bigint | other._bigint)
+        return NotImplemented
+
+    def __ior__(self, other):
+        if isinstance(other, UintSet):
+            self._replace(self._bigint | other._bigint)
+            return self
         return NotImplemented
 
     def union(self, *others):
-        cls = self.__class__
-        res = cls()
-        res._bigint = self._bigint
-        for other in others:    
-            if isinstance(other, cls):
-                res._bigint |= other._bigint
+        res = self._new(self._bigint)
+        # not res.update(): a FrozenUintSet result is built the same way
+        UintSet.update(res, *others)
+        return res
+
+    @staticmethod
+    def _split_operands(others):
+        bigints, iterables = [], []
+        for other in others:
+            if isinstance(other, UintSet):
+                bigints.append(other._bigint)
+            else:
+                try:
+                    iter(other)
+                except TypeError:
+                    raise TypeError(INVALID_ITER_ARG_MSG)
+                iterables.append(other)
+        return bigints, iterables
+
+    def update(self, *others):
+        bigints, iterables = self._split_operands(others)
+        bigints.append(self._bigint)
+        if iterables:  # one bitmap for all of them, ranges and arrays kept as is
+            batch = (iterables[0] if len(iterables) == 1
+                     else itertools.chain.from_iterable(iterables))
             try:
-                second = cls(other)
+                bigints.append(build_bigint(batch))
             except TypeError:
                 raise TypeError(INVALID_ITER_ARG_MSG)
-            else:
-                res._bigint |= second._bigint
-        return res
+        # smallest first, so the early steps work on short ints
+        res = 0
+        for bigint in sorted(bigints, key=int.bit_length):
+            res |= bigint
+        self._replace(res)
 
     def __and__(self, other):
-        cls = self.__class__
-        if isinstance(other, cls):
-            res = cls()
-            res._bigint = self._bigint & other._bigint
-            return res
+        if isinstance(other, UintSet):
+            return self._new(self._bigint & other._bigint)
+        return NotImplemented
+
+    def __iand__(self, other):
+        if isinstance(other, UintSet):
+            self._replace(self._bigint & other._bigint)
+            return self
         return NotImplemented
 
     def intersection(self, *others):
-        cls = self.__class__
-        res = cls()
-        res._bigint = self._bigint
-        for other in others:    
-            if isinstance(other, cls):
-                res._bigint &= other._bigint
+        res = self._new(self._bigint)
+        UintSet.intersection_update(res, *others)
+        return res
+
+    def intersection_update(self, *others):
+        bigints, iterables = self._split_operands(others)
+        bigints.append(self._bigint)
+        bigints.sort(key=bitops.count_ones)
+        res = bigints[0]
+        for bigint in bigints[1:]:
+            if not res:
+                break
+            res &= bigint
+        # iterables are not materialized: their elements probe the result
+        for other in iterables:
+            if not res:
+                break
             try:
-                second = cls(other)
+                res = probe_bigint(res, other)
             except TypeError:
                 raise TypeError(INVALID_ITER_ARG_MSG)
-            else:
-                res._bigint &= second._bigint
+        self._replace(res)
+
+    def __sub__(self, other):
+        if isinstance(other, UintSet):
+            return self._new(self._bigint & ~other._bigint)
+        return NotImplemented
+
+    def __isub__(self, other):
+        if isinstance(other, UintSet):
+            self._replace(self._bigint & ~other._bigint)
+            return self
+        return NotImplemented
+
+    def difference(self, *others):
+        res = self._new(self._bigint)
+        UintSet.difference_update(res, *others)
+        return res
+
+    def difference_update(self, *others):
+        for other in others:
+            self._replace(self._bigint & ~self._bigint_of(other))
+
+    def __xor__(self, other):
+        if isinstance(other, UintSet):
+            return self._new(self._bigint ^ other._bigint)
+        return NotImplemented
+
+    def __ixor__(self, other):
+        if isinstance(other, UintSet):
+            self._replace(self._bigint ^ other._bigint)
+            return self
+        return NotImplemented
+
+    def symmetric_difference(self, other):
+        res = self._new(self._bigint)
+        UintSet.symmetric_difference_update(res, other)
         return res
 
+    def symmetric_difference_update(self, other):
+        self._replace(self._bigint ^ self._bigint_of(other))
+
+
+class FrozenUintSet(UintSet):
+    """An immutable ``UintSet`` that can be hashed, e.g. to be a dict key.
+
+    In-place operators return a new ``FrozenUintSet``, like ``frozenset``.
+    """
+
+    _hash = None
+
+    def __hash__(self):
+        if self._hash is None:
+            self._hash = hash(self._bigint)
+        return self._hash
+
+    def _immutable(self, *args):
+        raise TypeError(IMMUTABLE_MSG)
+
+    add = discard = remove = _immutable
+    update = intersection_update = _immutable
+    difference_update = symmetric_difference_update = _immutable
+
+    __ior__ = UintSet.__or__
+    __iand__ = UintSet.__and__
+    __isub__ = UintSet.__sub__
+    __ixor__ = UintSet.__xor__
+
+
+def read_header(buffer, offset=0):
+    """Check the header at ``offset``, return the bitmap size and count."""
+    try:
+        magic, version, size, count = HEADER.unpack_from(buffer, offset)
+    except struct.error:
+        raise ValueError(INVALID_FORMAT_MSG)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(INVALID_FORMAT_MSG)
+    if len(buffer) < offset + HEADER.size + size or count > 8 * size:
+        raise ValueError(INVALID_FORMAT_MSG)
+    return size, count
+
+
+class MappedUintSet:
+    """Read-only view of a serialized UintSet in a memory-mapped file.
+
+    Membership, length and iteration read the mapped bytes directly; the
+    bitmap is never loaded as an ``int``. ``offset`` locates the set in
+    files holding several ``to_bytes`` outputs back to back.
+    """
+
+    def __init__(self, path, offset=0):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._size, self._count = read_header(self._mmap, offset)
+        except ValueError:
+            self._mmap.close()
+            raise
+        self._start = offset + HEADER.size
+
+    def close(self):
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, elem):
+        if not isinstance(elem, int):
+            raise TypeError(INVALID_ELEMENT_MSG)
+        if elem < 0:
+            raise ValueError(INVALID_ELEMENT_MSG)
+        byte = elem >> 3
+        if byte >= self._size:
+            return False
+        return bool(self._mmap[self._start + byte] >> (elem & 7) & 1)
+
+    def __iter__(self):
+        # copies one chunk at a time: a view held by a suspended iterator
+        # would make close() fail
+        stop = self._start + self._size
+        for pos in range(self._start, stop, bitops.CHUNK_SIZE):
+            chunk = self._mmap[pos:min(pos + bitops.CHUNK_SIZE, stop)]
+            base = (pos - self._start) * 8
+            for e in bitops.find_ones_in_bytes(chunk):
+                yield base + e
+
+    def to_uintset(self):
+        return UintSet.from_buffer(self._mmap, self._start - HEADER.size)
+
+    def __repr__(self):
+        return f'MappedUintSet({self.path!r})'
@@ -1,9 +1,10 @@
 import pytest
 
-from bitops import count_ones, get_bit, set_bit, unset_bit, find_ones
+from bitops import count_ones, count_ones_table, get_bit, set_bit, unset_bit
+from bitops import find_ones, find_ones_in_bytes, is_subset, is_disjoint
 
 
-@pytest.mark.parametrize('bigint, want', [
+count_ones_cases = [
     (0, 0),
     (1, 1),
     (0b10, 1),
@@ -11,12 +12,27 @@ from bitops import count_ones, get_bit, set_bit, unset_bit, find_ones
     (0b1_0101_0101, 5),
     (2**64, 1),
     (2**64 - 1, 64),
-])
+]
+
+
+@pytest.mark.parametrize('bigint, want', count_ones_cases)
 def test_count_ones(bigint, want):
     got = count_ones(bigint)
     assert got == want
 
 
+@pytest.mark.parametrize('bigint, want', count_ones_cases)
+def test_count_ones_table(bigint, want):
+    got = count_ones_table(bigint)
+    assert got == want
+
+
+def test_count_ones_table_many_chunks():
+    bigint = 2**(2**20) - 1  # 2**20 bits set: two chunks
+    assert count_ones_table(bigint) == 2**20
+    assert count_ones_table(bigint << 2**20) == 2**20
+
+
 @pytest.mark.parametrize('bigint, index, want', [
     (0, 0, 0),
     (0, 1, 0),
@@ -88,7 +104,62 @@ def test_unset_bit(bigint, index, want):
     (0b1_0101_0101, [0, 2, 4, 6, 8]),
     (2**64, [64]),
     (2**64 - 1, list(range(0, 64))),
+    (2**64 + 2**63 + 2**7, [7, 63, 64]),  # runs across word boundaries
 ])
 def test_find_ones(bigint, want):
     got = list(find_ones(bigint))
     assert got == want
+
+
+def test_find_ones_sparse():
+    got = list(find_ones(2**10_000_000 + 2**5_000_000))
+    assert got == [5_000_000, 10_000_000]
+
+
+@pytest.mark.parametrize('data, want', [
+    (b'', []),
+    (b'\x00\x00', []),
+    (b'\x01', [0]),
+    (b'\x00\x80\x00\x01', [15, 24]),
+    (bytes(9) + b'\xff', list(range(72, 80))),
+    (b'\xff' * 9 + b'\x00\x03', list(range(72)) + [80, 81]),
+])
+def test_find_ones_in_bytes(data, want):
+    got = list(find_ones_in_bytes(data))
+    assert got == want
+
+
+@pytest.mark.parametrize('a, b, want', [
+    (0, 0, True),
+    (0, 0b101, True),
+    (0b1, 0b101, True),
+    (0b101, 0b101, True),
+    (0b10, 0b101, False),
+    (0b1000, 0b101, False),
+    (2**64 + 1, 2**64 + 2**7 + 1, True),
+])
+def test_is_subset(a, b, want):
+    assert is_subset(a, b) == want
+
+
+def test_is_subset_many_chunks():
+    big = 2**2_000_000 - 1
+    assert is_subset(big ^ 2**1_000_000, big)
+    assert not is_subset(big, big ^ 2**1_000_000)
+
+
+@pytest.mark.parametrize('a, b, want', [
+    (0, 0, True),
+    (0b10, 0b101, True),
+    (0b11, 0b101, False),
+    (2**64, 2**63 + 2**65, True),
+    (2**64 + 1, 2**100 + 2**64, False),
+])
+def test_is_disjoint(a, b, want):
+    assert is_disjoint(a, b) == want
+    assert is_disjoint(b, a) == want
+
+
+def test_is_disjoint_many_chunks():
+    assert is_disjoint(2**2_000_000, 2**1_999_999 - 1)
+    assert not is_disjoint(2**2_000_000 + 1, 2**1_999_999 + 1)
@@ -7,8 +7,27 @@ try:
 except ImportError:
 	_geohash = None
 
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+from array import array
+from bisect import bisect_left
+from collections import deque
+from functools import lru_cache
+import heapq
+import math
+import mmap
+import os
+import sys
+
 __version__ = "0.8.5"
-__all__ = ['encode','decode','decode_exactly','bbox', 'neighbors', 'expand']
+__all__ = ['encode','decode','decode_exactly','decode_bytes','bbox', 'neighbors', 'expand',
+	'encode_many', 'decode_many', 'encode_uint64', 'decode_uint64', 'expand_uint64',
+	'encode_uint64_many', 'decode_uint64_many', 'GeohashIndex',
+	'cover_bbox', 'cover_bbox_uint64', 'enable_cache', 'disable_cache', 'cache_info',
+	'encode_file']
 
 _base32 = '0123456789bcdefghjkmnpqrstuvwxyz'
 _base32_map = {}
@@ -17,7 +36,6 @@ for i in range(len(_base32)):
 del i
 
 LONG_ZERO = 0
-import sys
 if sys.version_info[0] < 3:
 	LONG_ZERO = long(0)
 
@@ -42,6 +60,29 @@ def _float_hex_to_int(f):
 	
 	return r, half_len+1
 
+def _quantize_fromhex(f, length):
+	a = _float_hex_to_int(f)
+	if a[1] > length:
+		return a[0]>>(a[1]-length)
+	return a[0]<<(length-a[1])
+
+def _quantize_scaled(f, length):
+	'''
+	quantize f in [-1.0, 1.0) to a length bit cell number: floor((f+1)*2**(length-1)).
+	scaling by a power of two and flooring are exact, so this matches _quantize_fromhex bit for bit.
+	2**(length-1) only fits a float up to about 1000 bits, longer codes take the float.hex() path.
+	'''
+	if length > 1000:
+		return _quantize_fromhex(f, length)
+	half = 1<<(length-1)
+	return int(math.floor(f*half)) + half
+
+# pure python quantization engine used by encode, None selects the legacy arithmetic
+_quantize = _quantize_scaled
+
+# decode and bbox fall back to the legacy arithmetic without float.fromhex
+_has_fromhex = hasattr(float, "fromhex")
+
 def _int_to_float_hex(i, l):
 	if l==0:
 		return -1.0
@@ -93,19 +134,9 @@ def encode(latitude, longitude, precision=12):
 	if xprecision%2==1:
 		lon_length+=1
 	
-	if hasattr(float, "fromhex"):
-		a = _float_hex_to_int(latitude/90.0)
-		o = _float_hex_to_int(longitude/180.0)
-		if a[1] > lat_length:
-			ai = a[0]>>(a[1]-lat_length)
-		else:
-			ai = a[0]<<(lat_length-a[1])
-		
-		if o[1] > lon_length:
-			oi = o[0]>>(o[1]-lon_length)
-		else:
-			oi = o[0]<<(lon_length-o[1])
-		
+	if _quantize:
+		ai = _quantize(latitude/90.0, lat_length)
+		oi = _quantize(longitude/180.0, lon_length)
 		return _encode_i2c(ai, oi, lat_length, lon_length)[:precision]
 	
 	lat = latitude/180.0
@@ -123,43 +154,68 @@ def encode(latitude, longitude, precision=12):
 	
 	return _encode_i2c(lat,lon,lat_length,lon_length)[:precision]
 
-def _decode_c2i(hashcode):
+# the bits of a character pair, even position first: (5 longitude bits, 5 latitude bits),
+# and of a single trailing character at an even position: (3 longitude bits, 2 latitude bits).
+# both are keyed by the character codes so that bytes can be looked up directly.
+_char_bits = {}
+for i in range(32):
+	_char_bits[ord(_base32[i])] = (((i>>2)&4) | ((i>>1)&2) | (i&1), ((i>>2)&2) | ((i>>1)&1))
+_pair_bits = {}
+for i in range(32):
+	for j in range(32):
+		o3, a2 = _char_bits[ord(_base32[i])]
+		a3, o2 = _char_bits[ord(_base32[j])]
+		_pair_bits[(ord(_base32[i])<<8) | ord(_base32[j])] = ((o3<<2) | o2, (a2<<3) | a3)
+del i, j, o3, a2, a3, o2
+
+def _invalid_char(data):
+	'''
+	the first character of data that is not a geohash digit, for the KeyError.
+	'''
+	for c in data:
+		if c not in _char_bits:
+			return chr(c)
+
+def _decode_b2i(data):
 	lon = 0
 	lat = 0
-	bit_length = 0
-	lat_length = 0
-	lon_length = 0
-	for i in hashcode:
-		t = _base32_map[i]
-		if bit_length%2==0:
-			lon = lon<<3
-			lat = lat<<2
-			lon += (t>>2)&4
-			lat += (t>>2)&2
-			lon += (t>>1)&2
-			lat += (t>>1)&1
-			lon += t&1
-			lon_length+=3
-			lat_length+=2
-		else:
-			lon = lon<<2
-			lat = lat<<3
-			lat += (t>>2)&4
-			lon += (t>>2)&2
-			lat += (t>>1)&2
-			lon += (t>>1)&1
-			lat += t&1
-			lon_length+=2
-			lat_length+=3
-		
-		bit_length+=5
+	try:
+		for hi, lo in zip(data[0::2], data[1::2]):
+			o, a = _pair_bits[(hi<<8) | lo]
+			lon = (lon<<5) | o
+			lat = (lat<<5) | a
+	except KeyError:
+		raise KeyError(_invalid_char(data))
+	
+	lat_length = lon_length = (len(data)>>1)*5
+	if len(data)&1:
+		if data[-1] not in _char_bits:
+			raise KeyError(chr(data[-1]))
+		o, a = _char_bits[data[-1]]
+		lon = (lon<<3) | o
+		lat = (lat<<2) | a
+		lon_length += 3
+		lat_length += 2
 	
 	return (lat,lon,lat_length,lon_length)
 
+def _decode_c2i(hashcode):
+	try:
+		data = hashcode.encode('ascii')
+	except UnicodeError:
+		raise KeyError(next(c for c in hashcode if c not in _base32))
+	return _decode_b2i(data)
+
 def decode(hashcode, delta=False):
 	'''
 	decode a hashcode and get center coordinate, and distance between center and outer border
 	'''
+	cached = _caches.get('decode')
+	if cached:
+		return cached(hashcode, delta)
+	return _decode(hashcode, delta)
+
+def _decode(hashcode, delta=False):
 	if _geohash:
 		(lat,lon,lat_bits,lon_bits) = _geohash.decode(hashcode)
 		latitude_delta = 90.0/(1<<lat_bits)
@@ -171,8 +227,17 @@ def decode(hashcode, delta=False):
 		return latitude,longitude
 	
 	(lat,lon,lat_length,lon_length) = _decode_c2i(hashcode)
-	
-	if hasattr(float, "fromhex"):
+	return _decode_i2f(lat,lon,lat_length,lon_length,delta)
+
+def decode_bytes(data, delta=False):
+	'''
+	same as decode, for a hashcode given as bytes, bytearray or memoryview.
+	'''
+	(lat,lon,lat_length,lon_length) = _decode_b2i(data)
+	return _decode_i2f(lat,lon,lat_length,lon_length,delta)
+
+def _decode_i2f(lat, lon, lat_length, lon_length, delta):
+	if _has_fromhex:
 		latitude_delta  = 90.0/(1<<lat_length)
 		longitude_delta = 180.0/(1<<lon_length)
 		latitude = _int_to_float_hex(lat, lat_length) * 90.0 + latitude_delta
@@ -198,12 +263,156 @@ def decode(hashcode, delta=False):
 def decode_exactly(hashcode):
 	return decode(hashcode, True)
 
+## batch operations below
+
+def _spread_bits(x):
+	'''
+	move bit i of the lower 32 bits of x to bit 2*i. works on ints and numpy uint64 arrays.
+	'''
+	x = x & 0xFFFFFFFF
+	x = (x | (x<<16)) & 0x0000FFFF0000FFFF
+	x = (x | (x<<8)) & 0x00FF00FF00FF00FF
+	x = (x | (x<<4)) & 0x0F0F0F0F0F0F0F0F
+	x = (x | (x<<2)) & 0x3333333333333333
+	x = (x | (x<<1)) & 0x5555555555555555
+	return x
+
+def _squash_bits(x):
+	'''
+	inverse of _spread_bits: gather the even bits of x into the lower 32 bits.
+	'''
+	x = x & 0x5555555555555555
+	x = (x | (x>>1)) & 0x3333333333333333
+	x = (x | (x>>2)) & 0x0F0F0F0F0F0F0F0F
+	x = (x | (x>>4)) & 0x00FF00FF00FF00FF
+	x = (x | (x>>8)) & 0x0000FFFF0000FFFF
+	x = (x | (x>>16)) & 0xFFFFFFFF
+	return x
+
+def _bit_lengths(precision):
+	lat_length = int(precision*5/2)
+	return lat_length, precision*5-lat_length
+
+def encode_many(latitudes, longitudes, precision=12, parallel=False):
+	'''
+	encode sequences (or float64 buffers) of coordinates in one call.
+	returns an array of fixed-width bytes when numpy is available, a list of bytes otherwise.
+	parallel=True (or a number of processes) splits the work over a process pool.
+	'''
+	if parallel and precision >= 1:
+		return _parallel_encode(latitudes, longitudes, precision, _processes(parallel))
+	if numpy is None or precision < 1 or precision > 12:
+		codes = [encode(latitude, longitude, precision).encode('ascii')
+			for latitude, longitude in zip(latitudes, longitudes)]
+		if numpy is None:
+			return codes
+		return numpy.array(codes, dtype='S%d' % max(precision, 1))
+	
+	lat = numpy.asarray(latitudes, dtype=numpy.float64).ravel()
+	lon = numpy.asarray(longitudes, dtype=numpy.float64).ravel()
+	if lat.shape != lon.shape:
+		raise ValueError("latitudes and longitudes must have the same length.")
+	if not (numpy.isfinite(lat).all() and numpy.isfinite(lon).all()):
+		raise ValueError("latitudes and longitudes must be finite.")
+	if ((lat >= 90.0) | (lat < -90.0)).any():
+		raise Exception("invalid latitude.")
+	wrap = (lon < -180.0) | (lon >= 180.0)
+	if wrap.any():
+		lon = numpy.where(wrap, numpy.mod(lon + 180.0, 360.0) - 180.0, lon)
+	
+	# same quantization as the float.hex() path of encode: floor((f+1)*2**(length-1))
+	lat_length, lon_length = _bit_lengths(precision)
+	lat_half = float(1<<(lat_length-1))
+	lon_half = float(1<<(lon_length-1))
+	ai = (numpy.floor(lat/90.0 * lat_half) + lat_half).astype(numpy.uint64)
+	oi = (numpy.floor(lon/180.0 * lon_half) + lon_half).astype(numpy.uint64)
+	
+	# the first geohash bit is always a longitude bit
+	if lat_length == lon_length:
+		code = (_spread_bits(oi)<<1) | _spread_bits(ai)
+	else:
+		code = _spread_bits(oi) | (_spread_bits(ai)<<1)
+	
+	shifts = numpy.arange(precision-1, -1, -1, dtype=numpy.uint64) * 5
+	digits = (code[:, None] >> shifts) & 0x1F
+	table = numpy.frombuffer(_base32.encode('ascii'), dtype=numpy.uint8)
+	chars = numpy.ascontiguousarray(table[digits])
+	return chars.view('S%d' % precision).ravel()
+
+def decode_many(hashcodes, parallel=False):
+	'''
+	decode a sequence of hashcodes (str or bytes) and get the center coordinates.
+	returns a pair of arrays (latitudes, longitudes).
+	parallel=True (or a number of processes) splits hashcodes of equal length over a process pool.
+	'''
+	if parallel:
+		if not hasattr(hashcodes, '__len__'): # an iterator is read once, here
+			hashcodes = list(hashcodes)
+		ret = _parallel_decode(hashcodes, _processes(parallel))
+		if ret is not None:
+			return ret
+	
+	if numpy is not None:
+		codes = numpy.asarray(hashcodes)
+		if codes.dtype.kind == 'U':
+			codes = numpy.char.encode(codes, 'ascii')
+		if codes.dtype.kind == 'S' and codes.size and codes.dtype.itemsize <= 12:
+			precision = codes.dtype.itemsize
+			chars = numpy.ascontiguousarray(codes.ravel()).view(numpy.uint8).reshape(-1, precision)
+			# shorter hashcodes are NUL padded, those take the generic path below
+			if not (chars == 0).any():
+				return _decode_chars(chars, precision)
+	
+	lats = array('d')
+	lons = array('d')
+	for hashcode in hashcodes:
+		if isinstance(hashcode, bytes):
+			hashcode = hashcode.decode('ascii')
+		latitude, longitude = decode(hashcode)
+		lats.append(latitude)
+		lons.append(longitude)
+	
+	if numpy is not None:
+		return numpy.array(lats), numpy.array(lons)
+	return lats, lons
+
+def _decode_chars(chars, precision):
+	table = numpy.full(256, -1, dtype=numpy.int16)
+	table[numpy.frombuffer(_base32.encode('ascii'), dtype=numpy.uint8)] = numpy.arange(32)
+	digits = table[chars]
+	if (digits < 0).any():
+		raise KeyError(chr(chars[digits < 0][0]))
+	
+	code = numpy.zeros(len(chars), dtype=numpy.uint64)
+	for i in range(precision):
+		code = (code<<5) | digits[:, i].astype(numpy.uint64)
+	
+	lat_length, lon_length = _bit_lengths(precision)
+	if lat_length == lon_length:
+		oi = _squash_bits(code>>1)
+		ai = _squash_bits(code)
+	else:
+		oi = _squash_bits(code)
+		ai = _squash_bits(code>>1)
+	
+	lat_half = float(1<<(lat_length-1))
+	lon_half = float(1<<(lon_length-1))
+	latitude = (ai.astype(numpy.float64) - lat_half) / lat_half * 90.0 + 90.0/(1<<lat_length)
+	longitude = (oi.astype(numpy.float64) - lon_half) / lon_half * 180.0 + 180.0/(1<<lon_length)
+	return latitude, longitude
+
 ## hashcode operations below
 
 def bbox(hashcode):
 	'''
 	decode a hashcode and get north, south, east and west border.
 	'''
+	cached = _caches.get('bbox')
+	if cached:
+		return dict(cached(hashcode))
+	return _bbox(hashcode)
+
+def _bbox(hashcode):
 	if _geohash:
 		(lat,lon,lat_bits,lon_bits) = _geohash.decode(hashcode)
 		latitude_delta = 180.0/(1<<lat_bits)
@@ -211,7 +420,7 @@ def bbox(hashcode):
 		return {'s':lat,'w':lon,'n':lat+latitude_delta,'e':lon+longitude_delta}
 	
 	(lat,lon,lat_length,lon_length) = _decode_c2i(hashcode)
-	if hasattr(float, "fromhex"):
+	if _has_fromhex:
 		latitude_delta  = 180.0/(1<<lat_length)
 		longitude_delta = 360.0/(1<<lon_length)
 		latitude = _int_to_float_hex(lat, lat_length) * 90.0
@@ -236,6 +445,12 @@ def bbox(hashcode):
 	return ret
 
 def neighbors(hashcode):
+	cached = _caches.get('neighbors')
+	if cached:
+		return list(cached(hashcode))
+	return _neighbors(hashcode)
+
+def _neighbors(hashcode):
 	if _geohash and len(hashcode)<25:
 		return _geohash.neighbors(hashcode)
 	
@@ -260,28 +475,48 @@ def neighbors(hashcode):
 	return ret
 
 def expand(hashcode):
+	cached = _caches.get('expand')
+	if cached:
+		return list(cached(hashcode))
+	return _expand(hashcode)
+
+def _expand(hashcode):
 	ret = neighbors(hashcode)
 	ret.append(hashcode)
 	return ret
 
+## opt-in memoization of the hashcode operations
+
+_caches = {}
+
+def enable_cache(maxsize=4096):
+	'''
+	memoize decode, bbox, neighbors and expand, each in a thread-safe LRU cache bounded to maxsize entries.
+	calling it again replaces the caches (and resets their statistics).
+	'''
+	global _caches
+	_caches = {
+		'decode': lru_cache(maxsize)(_decode),
+		'bbox': lru_cache(maxsize)(_bbox),
+		'neighbors': lru_cache(maxsize)(lambda hashcode: tuple(_neighbors(hashcode))),
+		'expand': lru_cache(maxsize)(lambda hashcode: tuple(_expand(hashcode))),
+	}
+
+def disable_cache():
+	global _caches
+	_caches = {}
+
+def cache_info():
+	'''
+	get the hits, misses, maxsize and currsize of each cache, keyed by function name.
+	'''
+	return dict((name, cached.cache_info()) for name, cached in _caches.items())
+
 def _uint64_interleave(lat32, lon32):
-	intr = 0
-	boost = (0,1,4,5,16,17,20,21,64,65,68,69,80,81,84,85)
-	for i in range(8):
-		intr = (intr<<8) + (boost[(lon32>>(28-i*4))%16]<<1) + boost[(lat32>>(28-i*4))%16]
-	
-	return intr
+	return (_spread_bits(lon32)<<1) | _spread_bits(lat32)
 
 def _uint64_deinterleave(ui64):
-	lat = lon = 0
-	boost = ((0,0),(0,1),(1,0),(1,1),(0,2),(0,3),(1,2),(1,3),
-			 (2,0),(2,1),(3,0),(3,1),(2,2),(2,3),(3,2),(3,3))
-	for i in range(16):
-		p = boost[(ui64>>(60-i*4))%16]
-		lon = (lon<<2) + p[0]
-		lat = (lat<<2) + p[1]
-	
-	return (lat, lon)
+	return (_squash_bits(ui64), _squash_bits(ui64>>1))
 
 def encode_uint64(latitude, longitude):
 	if latitude >= 90.0 or latitude < -90.0:
@@ -313,6 +548,203 @@ def decode_uint64(ui64):
 	lat,lon = _uint64_deinterleave(ui64)
 	return (180.0*lat/(1<<32) - 90.0, 360.0*lon/(1<<32) - 180.0)
 
+def encode_uint64_many(latitudes, longitudes, parallel=False):
+	'''
+	encode sequences (or float64 buffers) of coordinates to uint64 keys, returned as array('Q').
+	parallel=True (or a number of processes) splits the work over a process pool.
+	'''
+	if parallel:
+		return _parallel_encode_uint64(latitudes, longitudes, _processes(parallel))
+	
+	keys = array('Q')
+	if numpy is None:
+		for latitude, longitude in zip(latitudes, longitudes):
+			keys.append(encode_uint64(latitude, longitude))
+		return keys
+	
+	lat = numpy.asarray(latitudes, dtype=numpy.float64).ravel()
+	lon = numpy.asarray(longitudes, dtype=numpy.float64).ravel()
+	if lat.shape != lon.shape:
+		raise ValueError("latitudes and longitudes must have the same length.")
+	if not (numpy.isfinite(lat).all() and numpy.isfinite(lon).all()):
+		raise ValueError("latitudes and longitudes must be finite.")
+	if ((lat >= 90.0) | (lat < -90.0)).any():
+		raise ValueError("Latitude must be in the range of (-90.0, 90.0)")
+	wrap = (lon < -180.0) | (lon >= 180.0)
+	if wrap.any():
+		lon = numpy.where(wrap, numpy.mod(lon + 180.0, 360.0) - 180.0, lon)
+	
+	ai = (((lat + 90.0)/180.0)*float(1<<32)).astype(numpy.uint64)
+	oi = (((lon + 180.0)/360.0)*float(1<<32)).astype(numpy.uint64)
+	keys.frombytes(_uint64_interleave(ai, oi).tobytes())
+	return keys
+
+def decode_uint64_many(keys, parallel=False):
+	'''
+	decode a sequence (or array('Q')) of uint64 keys, returns a pair of array('d') (latitudes, longitudes).
+	parallel=True (or a number of processes) splits the work over a process pool.
+	'''
+	if parallel:
+		return _parallel_decode_uint64(keys, _processes(parallel))
+	
+	lats = array('d')
+	lons = array('d')
+	if numpy is None:
+		for ui64 in keys:
+			latitude, longitude = decode_uint64(ui64)
+			lats.append(latitude)
+			lons.append(longitude)
+		return lats, lons
+	
+	lat, lon = _uint64_deinterleave(numpy.asarray(keys, dtype=numpy.uint64).ravel())
+	lats.frombytes((180.0*lat.astype(numpy.float64)/float(1<<32) - 90.0).tobytes())
+	lons.frombytes((360.0*lon.astype(numpy.float64)/float(1<<32) - 180.0).tobytes())
+	return lats, lons
+
+## process parallel batch operations
+# inputs and outputs live in shared memory blocks, only block names and offsets are pickled.
+
+_PARALLEL_MIN_CHUNK = 1<<15
+
+def _processes(parallel):
+	if parallel is True:
+		return os.cpu_count() or 1
+	return int(parallel)
+
+def _shared_block(nbytes, data=None):
+	from multiprocessing import shared_memory
+	block = shared_memory.SharedMemory(create=True, size=max(nbytes, 1))
+	if data is not None:
+		block.buf[:nbytes] = data
+	return block
+
+def _shared_floats(values, n):
+	if numpy is not None:
+		block = _shared_block(n*8)
+		view = numpy.ndarray((n,), dtype=numpy.float64, buffer=block.buf)
+		view[:] = numpy.asarray(values, dtype=numpy.float64).ravel()
+		del view
+		return block
+	return _shared_block(n*8, memoryview(_float_array(values)).cast('B'))
+
+def _read_block(typecode, buf, start, stop):
+	ret = array(typecode)
+	ret.frombytes(buf[start*ret.itemsize:stop*ret.itemsize])
+	return ret
+
+def _parallel_task(kind, names, start, stop, precision):
+	from multiprocessing import shared_memory
+	blocks = [shared_memory.SharedMemory(name=name) for name in names]
+	try:
+		if kind == 'encode':
+			codes = encode_many(_read_block('d', blocks[0].buf, start, stop),
+				_read_block('d', blocks[1].buf, start, stop), precision)
+			blocks[2].buf[start*precision:stop*precision] = codes.tobytes() if numpy is not None else b''.join(codes)
+		elif kind == 'decode':
+			data = bytes(blocks[0].buf[start*precision:stop*precision])
+			lats, lons = decode_many([data[i:i+precision] for i in range(0, len(data), precision)])
+			blocks[1].buf[start*8:stop*8] = array('d', lats).tobytes()
+			blocks[2].buf[start*8:stop*8] = array('d', lons).tobytes()
+		elif kind == 'encode_uint64':
+			keys = encode_uint64_many(_read_block('d', blocks[0].buf, start, stop),
+				_read_block('d', blocks[1].buf, start, stop))
+			blocks[2].buf[start*8:stop*8] = keys.tobytes()
+		else:
+			lats, lons = decode_uint64_many(_read_block('Q', blocks[0].buf, start, stop))
+			blocks[1].buf[start*8:stop*8] = lats.tobytes()
+			blocks[2].buf[start*8:stop*8] = lons.tobytes()
+	finally:
+		for block in blocks:
+			block.close()
+
+def _parallel_run(kind, blocks, n, processes, precision=0):
+	chunk = max(-(-n//(processes*4)), _PARALLEL_MIN_CHUNK)
+	names = [block.name for block in blocks]
+	import multiprocessing
+	pool = multiprocessing.Pool(min(processes, -(-n//chunk)))
+	try:
+		results = [pool.apply_async(_parallel_task, (kind, names, start, min(start+chunk, n), precision))
+			for start in range(0, n, chunk)]
+		for result in results:
+			result.get()
+	finally:
+		pool.terminate()
+
+def _release(blocks):
+	for block in blocks:
+		block.close()
+		block.unlink()
+
+def _parallel_encode(latitudes, longitudes, precision, processes):
+	n = len(latitudes)
+	if processes < 2 or n < 2*_PARALLEL_MIN_CHUNK:
+		return encode_many(latitudes, longitudes, precision)
+	if len(longitudes) != n:
+		raise ValueError("latitudes and longitudes must have the same length.")
+	
+	blocks = [_shared_floats(latitudes, n), _shared_floats(longitudes, n), _shared_block(n*precision)]
+	try:
+		_parallel_run('encode', blocks, n, processes, precision)
+		data = bytearray(blocks[2].buf[:n*precision])
+	finally:
+		_release(blocks)
+	if numpy is not None:
+		return numpy.frombuffer(data, dtype='S%d' % precision)
+	return [bytes(data[i:i+precision]) for i in range(0, len(data), precision)]
+
+def _parallel_decode(hashcodes, processes):
+	'''
+	returns None when the hashcodes do not share one length, those take the serial path.
+	'''
+	codes = [code.encode('ascii') if not isinstance(code, bytes) else code for code in hashcodes]
+	n = len(codes)
+	if not n:
+		return None
+	precision = len(codes[0])
+	if not precision or any(len(code) != precision for code in codes):
+		return None
+	if processes < 2 or n < 2*_PARALLEL_MIN_CHUNK:
+		return decode_many(codes)
+	
+	blocks = [_shared_block(n*precision, b''.join(codes)), _shared_block(n*8), _shared_block(n*8)]
+	try:
+		_parallel_run('decode', blocks, n, processes, precision)
+		lats = array('d', bytes(blocks[1].buf[:n*8]))
+		lons = array('d', bytes(blocks[2].buf[:n*8]))
+	finally:
+		_release(blocks)
+	if numpy is not None:
+		return numpy.frombuffer(lats, dtype=numpy.float64), numpy.frombuffer(lons, dtype=numpy.float64)
+	return lats, lons
+
+def _parallel_encode_uint64(latitudes, longitudes, processes):
+	n = len(latitudes)
+	if processes < 2 or n < 2*_PARALLEL_MIN_CHUNK:
+		return encode_uint64_many(latitudes, longitudes)
+	if len(longitudes) != n:
+		raise ValueError("latitudes and longitudes must have the same length.")
+	
+	blocks = [_shared_floats(latitudes, n), _shared_floats(longitudes, n), _shared_block(n*8)]
+	try:
+		_parallel_run('encode_uint64', blocks, n, processes)
+		return array('Q', bytes(blocks[2].buf[:n*8]))
+	finally:
+		_release(blocks)
+
+def _parallel_decode_uint64(keys, processes):
+	n = len(keys)
+	if processes < 2 or n < 2*_PARALLEL_MIN_CHUNK:
+		return decode_uint64_many(keys)
+	
+	if not isinstance(keys, array) or keys.typecode != 'Q':
+		keys = array('Q', keys)
+	blocks = [_shared_block(n*8, memoryview(keys).cast('B')), _shared_block(n*8), _shared_block(n*8)]
+	try:
+		_parallel_run('decode_uint64', blocks, n, processes)
+		return array('d', bytes(blocks[1].buf[:n*8])), array('d', bytes(blocks[2].buf[:n*8]))
+	finally:
+		_release(blocks)
+
 def expand_uint64(ui64, precision=50):
 	ui64 = ui64 & (0xFFFFFFFFFFFFFFFF << (64-precision))
 	lat,lon = _uint64_deinterleave(ui64)
@@ -463,3 +895,350 @@ def expand_uint64(ui64, precision=50):
 		ranges.append((a,b))
 	
 	return ranges
+
+## region covering below
+
+def _cover(s, w, n, e, max_cells, max_precision):
+	'''
+	refine the coarsest partially covered cell first, as long as the cell count stays within max_cells.
+	'''
+	cells = []
+	partial = [(0, '')]
+	while partial:
+		length, hashcode = partial[0]
+		if length >= max_precision:
+			break
+		inside = []
+		children = []
+		for c in _base32:
+			b = bbox(hashcode+c)
+			if b['s'] > n or b['n'] <= s or b['w'] > e or b['e'] <= w:
+				continue
+			if b['s'] >= s and b['n'] <= n and b['w'] >= w and b['e'] <= e:
+				inside.append(hashcode+c)
+			else:
+				children.append((length+1, hashcode+c))
+		if len(cells) + len(partial) - 1 + len(inside) + len(children) > max_cells:
+			break
+		heapq.heappop(partial)
+		cells.extend(inside)
+		for child in children:
+			heapq.heappush(partial, child)
+	
+	cells.extend(hashcode for length, hashcode in partial)
+	return cells
+
+def cover_bbox(s, w, n, e, max_cells=64, max_precision=12):
+	'''
+	get a small set of mixed precision hashcodes whose cells together cover the box.
+	cells lying completely inside the box are kept as they are,
+	cells on the border are split until max_cells or max_precision is reached.
+	'''
+	s = max(s, -90.0)
+	n = min(n, 90.0)
+	if s > n:
+		return []
+	if w > e: # the box crosses the 180th meridian, both halves share max_cells
+		if max_cells < 2:
+			return ['']
+		east = _cover(s, w, n, 180.0, max_cells//2, max_precision)
+		west = _cover(s, -180.0, n, e, max_cells-len(east), max_precision)
+		return sorted(set(east + west))
+	return sorted(_cover(s, w, n, e, max_cells, max_precision))
+
+def cover_bbox_uint64(s, w, n, e, max_cells=64, max_precision=12):
+	'''
+	same as cover_bbox, but returns merged ranges of encode_uint64 keys in the format of expand_uint64.
+	'''
+	ranges = []
+	for hashcode in cover_bbox(s, w, n, e, max_cells, min(max_precision, 12)):
+		(lat,lon,lat_length,lon_length) = _decode_c2i(hashcode)
+		ui64 = _uint64_interleave(lat<<(32-lat_length), lon<<(32-lon_length))
+		ranges.append((ui64, ui64 + (1<<(64-len(hashcode)*5))))
+	ranges.sort()
+	
+	shrink = []
+	for a,b in ranges:
+		if shrink and shrink[-1][1] == a:
+			shrink[-1] = (shrink[-1][0], b)
+		else:
+			shrink.append((a,b))
+	
+	return [(a or None, None if b == 0x10000000000000000 else b) for a,b in shrink]
+
+## spatial index below
+
+EARTH_RADIUS = 6371008.8 # mean radius in meters
+
+def _float_array(values):
+	if numpy is not None:
+		ret = array('d')
+		ret.frombytes(numpy.asarray(values, dtype=numpy.float64).ravel().tobytes())
+		return ret
+	return array('d', values)
+
+def _haversine(lat1, lon1, lat2, lon2):
+	dlat = math.radians(lat2-lat1)
+	dlon = math.radians(lon2-lon1)
+	a = math.sin(dlat/2)**2 + math.cos(math.radians(lat1))*math.cos(math.radians(lat2))*math.sin(dlon/2)**2
+	return 2*EARTH_RADIUS*math.asin(min(1.0, math.sqrt(a)))
+
+def _bbox_ranges(s, w, n, e):
+	'''
+	uint64 ranges covering the box: expand_uint64 around the center at the finest precision
+	whose cells are larger than the box half extents.
+	'''
+	latitude = (s+n)/2
+	longitude = (w+e)/2
+	half_lat = (n-s)/2
+	half_lon = (e-w)/2
+	precision = 64
+	while precision > 2:
+		if 180.0/(1<<(precision//2)) > half_lat and 360.0/(1<<((precision+1)//2)) > half_lon:
+			break
+		precision -= 1
+	
+	ranges = expand_uint64(encode_uint64(latitude, longitude), precision)
+	if not ranges:
+		return [(None, None)]
+	return ranges
+
+class GeohashIndex(object):
+	'''
+	static point index sorted by uint64 geohash keys, with payload ids kept in parallel.
+	bounding box and radius queries binary search the key ranges from expand_uint64,
+	so they cost O(log N + k) instead of a full scan.
+	'''
+	def __init__(self, latitudes=(), longitudes=(), ids=None):
+		lats = _float_array(latitudes)
+		lons = _float_array(longitudes)
+		keys = encode_uint64_many(lats, lons)
+		if ids is None:
+			ids = range(len(keys))
+		ids = list(ids)
+		if len(ids) != len(keys):
+			raise ValueError("ids must have the same length as the coordinates.")
+		
+		if numpy is not None:
+			order = numpy.argsort(numpy.frombuffer(keys, dtype=numpy.uint64), kind='stable')
+			self._keys = array('Q', numpy.frombuffer(keys, dtype=numpy.uint64)[order].tobytes())
+			self._lats = array('d', numpy.frombuffer(lats, dtype=numpy.float64)[order].tobytes())
+			self._lons = array('d', numpy.frombuffer(lons, dtype=numpy.float64)[order].tobytes())
+			self._ids = [ids[i] for i in order.tolist()]
+		else:
+			order = sorted(range(len(keys)), key=keys.__getitem__)
+			self._keys = array('Q', [keys[i] for i in order])
+			self._lats = array('d', [lats[i] for i in order])
+			self._lons = array('d', [lons[i] for i in order])
+			self._ids = [ids[i] for i in order]
+	
+	def __len__(self):
+		return len(self._keys)
+	
+	def _query(self, s, w, n, e):
+		if w > e: # the box crosses the 180th meridian
+			return self._query(s, w, n, 180.0) + self._query(s, -180.0, n, e)
+		s = max(s, -90.0)
+		n = min(n, 90.0)
+		if s > n or s >= 90.0:
+			return []
+		
+		keys = self._keys
+		lats = self._lats
+		lons = self._lons
+		ret = []
+		for start, stop in _bbox_ranges(s, w, n, e):
+			lo = 0 if start is None else bisect_left(keys, start)
+			hi = len(keys) if stop is None else bisect_left(keys, stop)
+			for i in range(lo, hi):
+				if s <= lats[i] <= n and w <= lons[i] <= e:
+					ret.append(i)
+		return ret
+	
+	def query_bbox(self, s, w, n, e):
+		'''
+		ids of the points inside south, west, north and east borders (inclusive).
+		'''
+		ids = self._ids
+		return [ids[i] for i in self._query(s, w, n, e)]
+	
+	def query_radius(self, latitude, longitude, meters):
+		'''
+		ids of the points within meters of the coordinate (great circle distance).
+		'''
+		angle = meters/EARTH_RADIUS
+		s = latitude - math.degrees(angle)
+		n = latitude + math.degrees(angle)
+		w, e = -180.0, 180.0
+		if s > -90.0 and n < 90.0:
+			ratio = math.sin(angle)/math.cos(math.radians(latitude))
+			if ratio < 1.0:
+				half_lon = math.degrees(math.asin(ratio))
+				w = longitude - half_lon
+				e = longitude + half_lon
+				if w < -180.0:
+					w += 360.0
+				if e >= 180.0:
+					e -= 360.0
+		
+		lats = self._lats
+		lons = self._lons
+		ids = self._ids
+		return [ids[i] for i in self._query(s, w, n, e)
+			if _haversine(latitude, longitude, lats[i], lons[i]) <= meters]
+
+## streaming file encoding below
+
+_RECORD_SIZE = 16 # a binary record is a little-endian float64 latitude followed by the longitude
+
+def _chunk_spans(mm, fmt, chunk_size):
+	'''
+	split the mapped file into (start, stop) spans of about chunk_size bytes, cut on record boundaries.
+	'''
+	size = len(mm)
+	if fmt == 'binary':
+		if size % _RECORD_SIZE:
+			raise ValueError("binary input must hold whole (latitude, longitude) float64 pairs.")
+		chunk_size = max(chunk_size - chunk_size % _RECORD_SIZE, _RECORD_SIZE)
+	
+	start = 0
+	while start < size:
+		stop = start + chunk_size
+		if fmt == 'csv' and stop < size:
+			newline = mm.find(b'\n', stop)
+			stop = size if newline < 0 else newline+1
+		stop = min(stop, size)
+		yield start, stop
+		start = stop
+
+def _read_chunk(mm, fmt, start, stop, skip_invalid=False):
+	if fmt == 'binary':
+		if numpy is not None:
+			pairs = numpy.frombuffer(mm, dtype='<f8', count=(stop-start)//8, offset=start)
+			return pairs[0::2], pairs[1::2]
+		pairs = array('d')
+		pairs.frombytes(mm[start:stop])
+		if sys.byteorder == 'big':
+			pairs.byteswap()
+		return pairs[0::2], pairs[1::2]
+	
+	lats = array('d')
+	lons = array('d')
+	pos = start
+	while pos < stop:
+		end = mm.find(b'\n', pos, stop)
+		if end < 0:
+			end = stop
+		line = mm[pos:end]
+		if line.strip(): # blank lines are skipped
+			fields = line.split(b',')
+			try:
+				latitude, longitude = map(float, fields) # exactly two fields
+			except ValueError:
+				if pos != 0 and not skip_invalid: # the first line may be a header
+					raise ValueError("invalid record at byte %d: %r" % (pos, line.rstrip()))
+			else:
+				lats.append(latitude)
+				lons.append(longitude)
+		pos = end+1
+	return lats, lons
+
+def _encode_chunk(lats, lons, output, precision):
+	if output == 'uint64':
+		keys = encode_uint64_many(lats, lons)
+		if sys.byteorder == 'big':
+			keys.byteswap()
+		return len(keys), keys.tobytes()
+	codes = encode_many(lats, lons, precision)
+	if not len(codes):
+		return 0, b''
+	return len(codes), b'\n'.join(codes) + b'\n'
+
+def _encode_span(path, fmt, start, stop, output, precision, skip_invalid):
+	with open(path, 'rb') as f:
+		mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+		try:
+			lats, lons = _read_chunk(mm, fmt, start, stop, skip_invalid)
+			ret = _encode_chunk(lats, lons, output, precision)
+			del lats, lons # release the views on mm
+			return ret
+		finally:
+			mm.close()
+
+def encode_file(src, dst, fmt='csv', output='hash', precision=12, chunk_size=1<<22, processes=None,
+		skip_invalid=False):
+	'''
+	stream latitude,longitude pairs from the file src, either CSV text ('csv') or packed
+	little-endian float64 pairs ('binary'), into dst (a path or a binary file object):
+	one hashcode per line ('hash') or packed little-endian uint64 keys ('uint64').
+	src is memory-mapped and encoded chunk by chunk, so memory use does not grow with the file size.
+	processes > 1 fans the chunks out to a multiprocessing pool. returns the number of encoded points.
+	a CSV line that is not a number pair raises ValueError with its byte offset, except for a header
+	on the first line and blank lines; skip_invalid=True drops such lines instead.
+	'''
+	if fmt not in ('csv', 'binary'):
+		raise ValueError("fmt must be 'csv' or 'binary'.")
+	if output not in ('hash', 'uint64'):
+		raise ValueError("output must be 'hash' or 'uint64'.")
+	
+	if isinstance(dst, str):
+		with open(dst, 'wb') as f:
+			return encode_file(src, f, fmt, output, precision, chunk_size, processes, skip_invalid)
+	
+	count = 0
+	with open(src, 'rb') as f:
+		if not f.seek(0, 2):
+			return 0 # an empty file can not be mapped
+		mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+		try:
+			if processes and processes > 1:
+				import multiprocessing
+				pool = multiprocessing.Pool(processes)
+				try:
+					pending = deque()
+					for start, stop in _chunk_spans(mm, fmt, chunk_size):
+						pending.append(pool.apply_async(_encode_span,
+							(src, fmt, start, stop, output, precision, skip_invalid)))
+						if len(pending) > 2*processes: # bound the results held in memory
+							n, data = pending.popleft().get()
+							count += n
+							dst.write(data)
+					while pending:
+						n, data = pending.popleft().get()
+						count += n
+						dst.write(data)
+				finally:
+					pool.terminate()
+			else:
+				for start, stop in _chunk_spans(mm, fmt, chunk_size):
+					lats, lons = _read_chunk(mm, fmt, start, stop, skip_invalid)
+					n, data = _encode_chunk(lats, lons, output, precision)
+					del lats, lons # release the views on mm
+					count += n
+					dst.write(data)
+		finally:
+			mm.close()
+	return count
+
+def main(argv=None):
+	import argparse
+	parser = argparse.ArgumentParser(prog='python -m geohash',
+		description='encode a file of latitude,longitude pairs to geohashes or uint64 keys.')
+	parser.add_argument('src', help='input file')
+	parser.add_argument('dst', nargs='?', default='-', help='output file (default: standard output)')
+	parser.add_argument('-f', '--format', choices=('csv', 'binary'), default='csv',
+		help='CSV text or packed little-endian float64 pairs (default: csv)')
+	parser.add_argument('-o', '--output', choices=('hash', 'uint64'), default='hash',
+		help='hashcode lines or packed little-endian uint64 keys (default: hash)')
+	parser.add_argument('-p', '--precision', type=int, default=12, help='hashcode length (default: 12)')
+	parser.add_argument('-j', '--processes', type=int, default=1, help='worker processes (default: 1)')
+	parser.add_argument('--chunk-size', type=int, default=1<<22, help='bytes per chunk (default: 4 MiB)')
+	parser.add_argument('--skip-invalid', action='store_true', help='drop CSV lines that are not number pairs')
+	args = parser.parse_args(argv)
+	
+	dst = sys.stdout.buffer if args.dst == '-' else args.dst
+	encode_file(args.src, dst, args.format, args.output, args.precision, args.chunk_size, args.processes,
+		args.skip_invalid)
+
+if __name__ == '__main__':
+	main()
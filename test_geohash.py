@@ -0,0 +1,261 @@
+import io
+import math
+import random
+from array import array
+
+import pytest
+
+import geohash
+
+
+random.seed(0)
+POINTS = [(random.uniform(-89.9, 89.9), random.uniform(-180, 179.9)) for _ in range(300)]
+POINTS += [(0.0, 0.0), (-90.0, -180.0), (89.999, 179.999), (45.0, -0.0), (-0.0, 90.0)]
+LATS = [lat for lat, lon in POINTS]
+LONS = [lon for lat, lon in POINTS]
+
+
+@pytest.fixture(params=['numpy', 'python'])
+def engine(request, monkeypatch):
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(geohash, 'numpy', None)
+    return request.param
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(geohash, '_PARALLEL_MIN_CHUNK', 16)
+
+
+@pytest.mark.parametrize("precision", [1, 5, 11, 12, 20])
+def test_encode_many(engine, precision):
+    got = [bytes(code) for code in geohash.encode_many(LATS, LONS, precision)]
+    want = [geohash.encode(lat, lon, precision).encode('ascii') for lat, lon in POINTS]
+    assert got == want
+
+
+@pytest.mark.parametrize("precision", [1, 6, 12, 15])
+def test_decode_many(engine, precision):
+    codes = [geohash.encode(lat, lon, precision) for lat, lon in POINTS]
+    lats, lons = geohash.decode_many(codes)
+    assert list(zip(lats, lons)) == [geohash.decode(code) for code in codes]
+
+
+def test_decode_many_mixed_lengths(engine):
+    codes = ['u4pru', 'u4p', b'xn76']
+    lats, lons = geohash.decode_many(codes)
+    assert list(zip(lats, lons)) == [geohash.decode(c if isinstance(c, str) else c.decode())
+                                     for c in codes]
+
+
+def test_uint64_many(engine):
+    keys = geohash.encode_uint64_many(LATS, LONS)
+    assert list(keys) == [geohash.encode_uint64(lat, lon) for lat, lon in POINTS]
+    lats, lons = geohash.decode_uint64_many(keys)
+    assert list(zip(lats, lons)) == [geohash.decode_uint64(key) for key in keys]
+
+
+@pytest.mark.parametrize("lat, lon", [(math.nan, 0.0), (0.0, math.inf), (-math.inf, 0.0)])
+def test_encode_many_not_finite(lat, lon):
+    pytest.importorskip('numpy')
+    with pytest.raises(ValueError):
+        geohash.encode_many([1.0, lat], [1.0, lon], 6)
+    with pytest.raises(ValueError):
+        geohash.encode_uint64_many([1.0, lat], [1.0, lon])
+
+
+def test_parallel(small_chunks):
+    codes = geohash.encode_many(LATS, LONS, 9)
+    got = geohash.encode_many(LATS, LONS, 9, parallel=2)
+    assert [bytes(c) for c in got] == [bytes(c) for c in codes]
+    assert list(zip(*geohash.decode_many(codes, parallel=2))) == \
+        list(zip(*geohash.decode_many(codes)))
+    keys = geohash.encode_uint64_many(LATS, LONS)
+    assert list(geohash.encode_uint64_many(LATS, LONS, parallel=2)) == list(keys)
+    assert list(zip(*geohash.decode_uint64_many(keys, parallel=2))) == \
+        list(zip(*geohash.decode_uint64_many(keys)))
+
+
+def test_parallel_decode_iterator():
+    lats, lons = geohash.decode_many(iter(['u4pru', 'u4p']), parallel=2)
+    assert list(zip(lats, lons)) == [geohash.decode('u4pru'), geohash.decode('u4p')]
+
+
+@pytest.mark.parametrize("quantize", ['_quantize_scaled', '_quantize_fromhex'])
+@pytest.mark.parametrize("precision", [1, 12, 40, 500])
+def test_quantize_engines(monkeypatch, quantize, precision):
+    want = [geohash.encode(lat, lon, precision) for lat, lon in POINTS[:20]]
+    monkeypatch.setattr(geohash, '_quantize', getattr(geohash, quantize))
+    assert [geohash.encode(lat, lon, precision) for lat, lon in POINTS[:20]] == want
+
+
+@pytest.mark.parametrize("code", ['u', 'u4pru', 'xn76urx6', 'u4pruydqqvj8'])
+def test_decode_bytes(code):
+    data = code.encode('ascii')
+    for value in (data, bytearray(data), memoryview(data)):
+        assert geohash.decode_bytes(value) == geohash.decode(code)
+        assert geohash.decode_bytes(value, True) == geohash.decode(code, True)
+
+
+@pytest.mark.parametrize("code, char", [('u4pa', 'a'), ('abc', 'a'), ('xyzi', 'i'), ('u4é', 'é')])
+def test_decode_invalid_char(code, char):
+    with pytest.raises(KeyError) as e:
+        geohash.decode(code)
+    assert e.value.args[0] == char
+
+
+def test_cache():
+    geohash.enable_cache(16)
+    try:
+        for _ in range(2):
+            assert geohash.decode('u4pru') == geohash._decode('u4pru')
+            assert geohash.bbox('u4pru') == geohash._bbox('u4pru')
+            assert geohash.neighbors('u4pru') == geohash._neighbors('u4pru')
+            assert geohash.expand('u4pru') == geohash._expand('u4pru')
+        info = geohash.cache_info()
+        assert set(info) == {'decode', 'bbox', 'neighbors', 'expand'}
+        assert all(i.hits >= 1 and i.misses == 1 for i in info.values())
+    finally:
+        geohash.disable_cache()
+    assert geohash.cache_info() == {}
+
+
+def in_cells(lat, lon, cells):
+    for code in cells:
+        b = geohash.bbox(code)
+        if b['s'] <= lat <= b['n'] and b['w'] <= lon <= b['e']:
+            return True
+    return False
+
+
+cover_cases = [
+        (10.0, 20.0, 11.0, 22.5),
+        (-45.0, -80.0, 45.0, 80.0),
+        (80.0, -10.0, 90.0, 10.0),  # touches the pole
+        (-5.0, 170.0, 5.0, -170.0),  # crosses the antimeridian
+        (0.1, 0.1, 0.1, 0.1),  # a point
+    ]
+
+@pytest.mark.parametrize("max_cells", [1, 2, 8, 64])
+@pytest.mark.parametrize("s, w, n, e", cover_cases)
+def test_cover_bbox(s, w, n, e, max_cells):
+    cells = geohash.cover_bbox(s, w, n, e, max_cells=max_cells, max_precision=8)
+    assert 1 <= len(cells) <= max_cells
+    lons = [w + (e - w) * i / 10 for i in range(11)] if w <= e else \
+        [w + (180 - w) * i / 5 for i in range(5)] + [-180 + (e + 180) * i / 5 for i in range(6)]
+    for i in range(11):
+        lat = s + (n - s) * i / 10
+        for lon in lons:
+            assert in_cells(lat, lon, cells), (lat, lon)
+
+
+@pytest.mark.parametrize("s, w, n, e", cover_cases)
+def test_cover_bbox_uint64(s, w, n, e):
+    ranges = geohash.cover_bbox_uint64(s, w, n, e, max_cells=16)
+    for lat, lon in [(s, w), (n, e), ((s + n) / 2, w)]:
+        key = geohash.encode_uint64(min(lat, 89.999), lon)
+        assert any((a or 0) <= key < (b or 1 << 64) for a, b in ranges)
+
+
+INDEX_IDS = ['p%d' % i for i in range(len(POINTS))]
+INDEX = geohash.GeohashIndex(LATS, LONS, INDEX_IDS)
+
+bbox_cases = [
+        (-10.0, -10.0, 10.0, 10.0),
+        (30.0, 100.0, 60.0, 150.0),
+        (-20.0, 170.0, 20.0, -170.0),  # crosses the antimeridian
+        (70.0, -180.0, 90.0, 180.0),  # north polar cap
+        (-90.0, -180.0, -60.0, 180.0),
+        (5.0, 5.0, 1.0, 6.0),  # empty
+    ]
+
+@pytest.mark.parametrize("s, w, n, e", bbox_cases)
+def test_index_query_bbox(s, w, n, e):
+    def inside(lat, lon):
+        in_lon = w <= lon <= e if w <= e else lon >= w or lon <= e
+        return s <= lat <= n and in_lon
+    want = {i for i, (lat, lon) in zip(INDEX_IDS, POINTS) if inside(lat, lon)}
+    assert set(INDEX.query_bbox(s, w, n, e)) == want
+
+
+@pytest.mark.parametrize("lat, lon, meters", [
+        (0.0, 0.0, 2e6),
+        (48.8, 2.3, 5e5),
+        (10.0, 179.5, 3e6),  # crosses the antimeridian
+        (89.0, 0.0, 1e6),  # covers the pole
+        (-60.0, -100.0, 8e6),
+    ])
+def test_index_query_radius(lat, lon, meters):
+    want = {i for i, (plat, plon) in zip(INDEX_IDS, POINTS)
+            if geohash._haversine(lat, lon, plat, plon) <= meters}
+    assert set(INDEX.query_radius(lat, lon, meters)) == want
+
+
+def test_index_ids():
+    index = geohash.GeohashIndex([1.0, 2.0], [3.0, 4.0])
+    assert len(index) == 2
+    assert sorted(index.query_bbox(0, 0, 5, 5)) == [0, 1]
+    with pytest.raises(ValueError):
+        geohash.GeohashIndex([1.0], [2.0], ids=['a', 'b'])
+
+
+@pytest.fixture
+def csv_file(tmp_path):
+    path = tmp_path / 'points.csv'
+    lines = ['lat,lon', ''] + ['%r,%r' % point for point in POINTS]
+    path.write_bytes('\r\n'.join(lines).encode('ascii'))
+    return str(path)
+
+
+@pytest.mark.parametrize("processes", [None, 2])
+@pytest.mark.parametrize("chunk_size", [64, 1 << 22])
+def test_encode_file_csv(csv_file, processes, chunk_size):
+    out = io.BytesIO()
+    count = geohash.encode_file(csv_file, out, precision=7, chunk_size=chunk_size,
+                                processes=processes)
+    assert count == len(POINTS)
+    assert out.getvalue().split() == [geohash.encode(lat, lon, 7).encode('ascii')
+                                      for lat, lon in POINTS]
+
+
+def test_encode_file_binary(tmp_path):
+    src = tmp_path / 'points.bin'
+    src.write_bytes(array('d', [v for point in POINTS for v in point]).tobytes())
+    dst = tmp_path / 'keys.bin'
+    count = geohash.encode_file(str(src), str(dst), fmt='binary', output='uint64', chunk_size=40)
+    assert count == len(POINTS)
+    keys = array('Q', dst.read_bytes())
+    assert list(keys) == [geohash.encode_uint64(lat, lon) for lat, lon in POINTS]
+
+
+def test_encode_file_invalid_record(tmp_path):
+    src = tmp_path / 'bad.csv'
+    src.write_bytes(b'lat,lon\n1.0,2.0\n3.0,abc\n5,6\n')
+    with pytest.raises(ValueError) as e:
+        geohash.encode_file(str(src), io.BytesIO(), precision=5)
+    assert 'byte 16' in e.value.args[0]
+    out = io.BytesIO()
+    assert geohash.encode_file(str(src), out, precision=5, skip_invalid=True) == 2
+    src.write_bytes(b'lat,lon\n1.0, 2.0 \n3.0,4.0,5.0\n5\n')
+    with pytest.raises(ValueError) as e:
+        geohash.encode_file(str(src), io.BytesIO(), precision=5)
+    assert 'byte 18' in e.value.args[0]
+    assert geohash.encode_file(str(src), io.BytesIO(), precision=5, skip_invalid=True) == 1
+
+
+def test_encode_file_errors(tmp_path):
+    src = tmp_path / 'odd.bin'
+    src.write_bytes(bytes(20))
+    with pytest.raises(ValueError):
+        geohash.encode_file(str(src), io.BytesIO(), fmt='binary')
+    with pytest.raises(ValueError):
+        geohash.encode_file(str(src), io.BytesIO(), fmt='json')
+
+
+def test_main(csv_file, tmp_path):
+    dst = tmp_path / 'codes.txt'
+    geohash.main([csv_file, str(dst), '--precision', '4'])
+    assert dst.read_bytes().split() == [geohash.encode(lat, lon, 4).encode('ascii')
+                                        for lat, lon in POINTS]